@@ -5,7 +5,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import plotly.figure_factory as ff
-from utils import process_data, get_download_data, calculate_review_stats, create_pie_chart, analyze_by_group, create_rating_trend_chart, create_rating_heatmap, save_fig_to_html
+from utils import prepare_review_data, associate_brand_data, read_data_file, format_read_stats, format_memory_usage, load_uploaded_dataset, derive_dataset, RAW_DATA_COLUMNS, BRAND_DATA_COLUMNS, get_download_data, calculate_review_stats, create_pie_chart, analyze_by_group, create_rating_trend_chart, create_rating_heatmap, save_fig_to_html
 import base64
 
 # 应用配置 - 可以在这里修改logo和作者信息
@@ -314,7 +314,7 @@ def create_pie_chart(review_counts, title='评论类型分布'):
 def analyze_by_group(df, group_by):
     """按指定字段进行分组分析"""
     # 始终计算ASIN维度的统计信息
-    asin_stats = df.groupby('Asin').agg({
+    asin_stats = df.groupby('Asin', observed=True).agg({
         'Rating': ['count', 'mean', 'std'],
         'Review Type': lambda x: x.value_counts().to_dict()
     }).round(2)
@@ -323,12 +323,12 @@ def analyze_by_group(df, group_by):
     asin_stats.columns = ['评论数量', '平均评分', '标准差', '评论类型分布']
     
     # 计算ASIN的评分分布
-    rating_dist = df.groupby(['Asin', 'Rating']).size().unstack(fill_value=0)
+    rating_dist = df.groupby(['Asin', 'Rating'], observed=True).size().unstack(fill_value=0)
     rating_dist_pct = rating_dist.div(rating_dist.sum(axis=1), axis=0) * 100
     
     # 如果是Asin+Model分析，创建组合数据用于时间趋势图
     if isinstance(group_by, list):
-        df['Group'] = df['Asin'] + ' - ' + df['Model']
+        df['Group'] = df['Asin'].astype('string') + ' - ' + df['Model'].astype('string')
         group_by_trend = 'Group'
     else:
         group_by_trend = 'Asin'
@@ -339,7 +339,8 @@ def create_rating_trend_chart(df, group_by):
     """创建评分趋势图"""
     # 按时间和分组计算平均评分
     df['Month'] = df['Date'].dt.to_period('M').astype(str)
-    trend_data = df.groupby(['Month', group_by])['Rating'].mean().reset_index()
+    trend_data = df.groupby(['Month', group_by], observed=True)['Rating'].mean().reset_index()
+    trend_data[group_by] = trend_data[group_by].astype(str)
     
     # 创建趋势图
     title = 'Asin-Model组合随时间的平均评分变化' if group_by == 'Group' else 'Asin随时间的平均评分变化'
@@ -382,10 +383,8 @@ def process_uploaded_file(uploaded_file):
     """处理上传的文件"""
     try:
         # 根据文件类型选择读取方法
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file)
+        if uploaded_file.name.endswith(('.csv', '.xlsx', '.xls', '.parquet')):
+            df, _ = read_data_file(uploaded_file, usecols=RAW_DATA_COLUMNS)
         else:
             st.error("不支持的文件格式，请上传CSV或Excel文件")
             return None
@@ -404,10 +403,8 @@ def process_uploaded_file(uploaded_file):
 def process_brand_file(uploaded_file):
     """处理品牌文件"""
     try:
-        if uploaded_file.name.endswith('.csv'):
-            brand_df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            brand_df = pd.read_excel(uploaded_file)
+        if uploaded_file.name.endswith(('.csv', '.xlsx', '.xls', '.parquet')):
+            brand_df, _ = read_data_file(uploaded_file, usecols=BRAND_DATA_COLUMNS)
         else:
             st.error("不支持的文件格式，请上传CSV或Excel文件")
             return None
@@ -463,7 +460,7 @@ def main():
             <h4 style="color: #FF9500; margin-bottom: 0.5rem;">💡 小贴士</h4>
             <ul style="font-size: 0.9rem; color: #666;">
                 <li>支持.xlsx和.xls格式</li>
-                <li>建议文件大小不超过50MB</li>
+                <li>建议文件大小不超过200MB，安装python-calamine后读取大文件更快</li>
                 <li>确保数据包含必要字段</li>
                 <li>英文评论可翻译为中文</li>
             </ul>
@@ -494,14 +491,14 @@ def main():
     with col1:
         uploaded_file = st.file_uploader(
             "选择评论数据Excel文件", 
-            type=['xlsx', 'xls'],
+            type=['xlsx', 'xls', 'parquet'],
             help="请上传包含Amazon评论数据的Excel文件"
         )
     
     with col2:
         brand_file = st.file_uploader(
             "选择品牌数据Excel文件（可选）", 
-            type=['xlsx', 'xls'],
+            type=['xlsx', 'xls', 'parquet'],
             help="请上传包含ASIN和Brand对应关系的Excel文件"
         )
     
@@ -512,12 +509,13 @@ def main():
             if 'brand_df' not in st.session_state:
                 st.session_state.brand_df = None
             if not st.session_state.file_processed:
-                df = pd.read_excel(uploaded_file)
+                # 只解析数据处理需要的列；同一文件只解析一次，页面重跑时从数据集注册表取出
+                upload_dataset_id, df, read_stats = load_uploaded_dataset(uploaded_file, usecols=RAW_DATA_COLUMNS)
                 st.session_state.original_df = df
                 
-                # 如果上传了品牌数据，读取并存储
+                # 如果上传了品牌数据，读取并存储（同一文件只解析一次）
                 if brand_file is not None:
-                    brand_df = pd.read_excel(brand_file)
+                    _, brand_df, _ = load_uploaded_dataset(brand_file, usecols=BRAND_DATA_COLUMNS, remember=False)
                     st.session_state.brand_df = brand_df
                     st.success("✅ 品牌数据上传成功！")
                 
@@ -535,6 +533,7 @@ def main():
                     st.metric("📈 总列数", len(df.columns))
                 with col3:
                     st.metric("💾 文件大小", f"{uploaded_file.size / 1024 / 1024:.2f} MB")
+                st.caption(format_read_stats(read_stats) if read_stats else "相同的文件已解析过，直接使用已加载的数据")
                 
                 # 数据预览
                 with st.expander("🔍 查看原始数据预览", expanded=False):
@@ -543,13 +542,19 @@ def main():
                 
                 # 数据处理按钮
                 st.markdown("<br>", unsafe_allow_html=True)
+                compact = st.checkbox(
+                    "🗜️ 使用紧凑数据类型",
+                    value=True,
+                    help="ASIN、品牌、型号和评论类型存为分类类型，标题和内容存为Arrow字符串，评分存为Int8，处理后的数据占用的内存通常减少一半以上"
+                )
                 if st.button("🚀 开始数据处理", type="primary", use_container_width=True):
                     with st.spinner('正在处理数据，请稍候...'):
                         try:
                             # 读取品牌数据（如果上传了的话）
                             brand_df = None
+                            brand_dataset_id = None
                             if brand_file is not None:
-                                brand_df = pd.read_excel(brand_file)
+                                brand_dataset_id, brand_df, _ = load_uploaded_dataset(brand_file, usecols=BRAND_DATA_COLUMNS, remember=False)
                                 st.write("品牌数据预览：", brand_df.head())
                                 st.write("品牌数据列名：", brand_df.columns.tolist())
                                 
@@ -559,14 +564,26 @@ def main():
                                 else:
                                     st.success("✅ 成功读取品牌数据")
                             
-                            # 处理数据
-                            processed_df = process_data(df, brand_df)
+                            # 处理数据：相同的上传文件和品牌文件（任何会话）只处理一次，结果登记为预处理数据集，
+                            # 统计分析、词云和关键词匹配页面可直接使用，无需重新上传
+                            processed_dataset_id, processed_df = derive_dataset(
+                                upload_dataset_id, 'processed', {'brand_file': brand_dataset_id, 'compact': compact},
+                                lambda: prepare_review_data(df, brand_df, compact), uploaded_file.name
+                            )
                             
                             if processed_df is not None:
+                                if 'Brand' in processed_df.columns:
+                                    st.success(f"✅ 成功关联品牌数据！共关联 {processed_df['Brand'].notna().sum()} 条记录")
                                 st.write("处理后的数据列名：", processed_df.columns.tolist())
+                                st.session_state.base_processed_dataset_id = processed_dataset_id
+                                st.session_state.processed_compact = compact
+                                st.session_state.processed_dataset_id = processed_dataset_id
                                 st.session_state.processed_df = processed_df
                                 st.session_state.file_processed = True
                                 st.rerun()
+                        except ValueError as e:
+                            # 缺少必要的列
+                            st.error(str(e))
                         except Exception as e:
                             st.error(f"处理数据时出错: {str(e)}")
             
@@ -612,6 +629,7 @@ def main():
                     if 'Review Type' in processed_df.columns:
                         positive_rate = (processed_df['Review Type'] == 'positive').mean() * 100
                         st.metric("😊 正面评论占比", f"{positive_rate:.1f}%")
+                st.caption(format_memory_usage(processed_df))
                 
                 # 添加品牌关联功能
                 st.markdown("""
@@ -622,56 +640,23 @@ def main():
                 
                 brand_file = st.file_uploader(
                     "上传品牌数据文件（包含ASIN和Brand列）",
-                    type=['xlsx', 'xls'],
+                    type=['xlsx', 'xls', 'parquet'],
                     help="请上传包含ASIN和Brand对应关系的Excel文件"
                 )
                 
                 if brand_file is not None:
                     try:
-                        brand_df = pd.read_excel(brand_file)
+                        brand_dataset_id, brand_df, _ = load_uploaded_dataset(brand_file, usecols=BRAND_DATA_COLUMNS, remember=False)
                         if 'ASIN' in brand_df.columns and 'Brand' in brand_df.columns:
-                            # 清理品牌数据
-                            brand_df['ASIN'] = brand_df['ASIN'].astype(str).str.strip()
-                            brand_df['Brand'] = brand_df['Brand'].astype(str).str.strip()
-                            
-                            # 处理重复的ASIN，保留最新的品牌信息
-                            brand_df = brand_df.drop_duplicates(subset=['ASIN'], keep='last')
-                            
-                            # 重命名ASIN列为Asin以匹配主数据
-                            brand_df = brand_df.rename(columns={'ASIN': 'Asin'})
-                            
-                            # 确保processed_df中有Brand列，如果没有则添加
-                            if 'Brand' not in processed_df.columns:
-                                processed_df['Brand'] = None
-                            
-                            # 关联品牌信息前先备份原始ID
-                            original_ids = processed_df['ID'].copy()
-                            
-                            # 关联品牌信息
-                            processed_df = processed_df.merge(
-                                brand_df[['Asin', 'Brand']], 
-                                on='Asin', 
-                                how='left',
-                                suffixes=('', '_new')
+                            # 关联品牌信息；页面每次重跑都会执行到这里，同一份预处理数据和品牌文件只关联一次
+                            base_df = processed_df
+                            processed_dataset_id, processed_df = derive_dataset(
+                                st.session_state.get('base_processed_dataset_id'), 'processed', {'brand_file': brand_dataset_id},
+                                lambda: associate_brand_data(base_df, brand_df, st.session_state.get('processed_compact', False)), uploaded_file.name
                             )
                             
-                            # 如果存在重复的Brand列，保留新的Brand列
-                            if 'Brand_new' in processed_df.columns:
-                                processed_df['Brand'] = processed_df['Brand_new']
-                                processed_df = processed_df.drop(columns=['Brand_new'])
-                            
-                            # 恢复原始ID
-                            processed_df['ID'] = original_ids
-                            
-                            # 重新排序列
-                            columns = processed_df.columns.tolist()
-                            if 'Brand' in columns:
-                                columns.remove('Brand')
-                            asin_index = columns.index('Asin')
-                            columns.insert(asin_index + 1, 'Brand')
-                            processed_df = processed_df[columns]
-                            
                             # 更新session state
+                            st.session_state.processed_dataset_id = processed_dataset_id
                             st.session_state.processed_df = processed_df
                             
                             st.success(f"✅ 成功关联品牌数据！共关联 {processed_df['Brand'].notna().sum()} 条记录")
@@ -709,8 +694,8 @@ def main():
                 with col2:
                     file_format = st.radio(
                         "📄 选择下载格式", 
-                        ["Excel", "TXT"],
-                        help="选择适合的文件格式"
+                        ["Excel", "Parquet", "TXT"],
+                        help="Parquet保留数据类型，在统计分析、词云和关键词匹配页面上传时读取最快"
                     )
                 
                 # 根据选择筛选数据
@@ -735,6 +720,16 @@ def main():
                             type="primary",
                             use_container_width=True
                         )
+                    elif file_format == "Parquet":
+                        file_data = get_download_data(download_df, 'parquet')
+                        st.download_button(
+                            label="📥 下载Parquet文件",
+                            data=file_data,
+                            file_name=f"amazon_reviews_{review_type.lower()}.parquet",
+                            mime="application/vnd.apache.parquet",
+                            type="primary",
+                            use_container_width=True
+                        )
                     else:
                         file_data = get_download_data(download_df, 'txt')
                         st.download_button(
@@ -753,6 +748,8 @@ def main():
                 with col1:
                      if st.button("🔄 清除数据重新开始", use_container_width=True):
                         st.session_state.processed_df = None
+                        st.session_state.processed_dataset_id = None
+                        st.session_state.base_processed_dataset_id = None
                         st.session_state.file_processed = False
                         st.session_state.original_df = None
                         st.session_state.brand_df = None
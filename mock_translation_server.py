@@ -0,0 +1,245 @@
+"""本地模拟翻译服务和离线性能基准
+
+模拟翻译服务（serve）在本地提供与批量翻译接口类似的HTTP接口，可配置延迟、错误率、
+限流(429)和每秒字符吞吐；基准测试（benchmark）用 engine='mock' 运行 translate_dataframe，
+不调用任何真实的翻译API，便于比较并发、批量、重试和缓存相关改动的效果。
+
+    python mock_translation_server.py serve --port 8765 --latency 0.1 --rate-limit 20
+    python mock_translation_server.py benchmark --rows 5000 --unique 1000 --workers 8 --batch-size 20 --server
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+import utils
+
+
+class MockServerConfig:
+    """模拟翻译服务的行为配置和请求统计（线程安全）"""
+    
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, rate_limit=None, chars_per_second=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.chars_per_second = chars_per_second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit or 0)
+        self._last_refill = time.monotonic()
+        self.stats = {'requests': 0, 'texts': 0, 'chars': 0, 'errors': 0, 'rate_limited': 0}
+    
+    def try_acquire(self):
+        """按每秒请求数限流，返回 (是否放行, 建议的重试等待秒数)"""
+        if not self.rate_limit:
+            return True, 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True, 0
+            return False, (1 - self._tokens) / self.rate_limit
+    
+    def sample(self):
+        """抽取一次请求的随机延迟抖动和是否失败"""
+        with self._lock:
+            return self._random.uniform(0, self.jitter), self._random.random() < self.error_rate
+    
+    def count(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self.stats[name] += value
+
+
+class MockTranslationHandler(BaseHTTPRequestHandler):
+    """POST /translate 翻译，GET /stats 查看请求统计"""
+    
+    protocol_version = 'HTTP/1.1'  # 支持长连接，客户端的连接池才有意义
+    
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.server.config.stats)
+        else:
+            self._send_json(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path != '/translate':
+            self._send_json(404, {'error': 'not found'})
+            return
+        
+        config = self.server.config
+        texts = payload.get('texts', [])
+        chars = sum(len(text) for text in texts)
+        config.count(requests=1)
+        
+        allowed, retry_after = config.try_acquire()
+        if not allowed:
+            config.count(rate_limited=1)
+            self._send_json(429, {'error': 'rate limited'}, {'Retry-After': f"{retry_after:.2f}"})
+            return
+        
+        jitter, failed = config.sample()
+        delay = config.latency + jitter
+        if config.chars_per_second:
+            delay += chars / config.chars_per_second
+        time.sleep(delay)
+        
+        if failed:
+            config.count(errors=1)
+            self._send_json(500, {'error': 'simulated failure'})
+            return
+        
+        config.count(texts=len(texts), chars=chars)
+        source = payload.get('source', 'en')
+        target = payload.get('target', 'zh')
+        self._send_json(200, {'translations': [utils.mock_translate_text(text, source, target) for text in texts]})
+    
+    def log_message(self, format, *args):
+        # 基准测试时请求量很大，不逐条打印访问日志
+        pass
+
+
+def start_mock_server(port=0, **config):
+    """在后台线程启动模拟翻译服务，返回 (server, endpoint)；port=0 时自动选择空闲端口"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockTranslationHandler)
+    server.daemon_threads = True
+    server.config = MockServerConfig(**config)
+    threading.Thread(target=server.serve_forever, name="mock-translation-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_benchmark_data(rows, unique, min_words=8, max_words=60, seed=0):
+    """生成基准测试用的评论数据：rows 行，其中 unique 条不同的文本"""
+    rng = random.Random(seed)
+    words = "great product quality battery screen price shipping works fine broke after week would buy again".split()
+    texts = [
+        ' '.join(rng.choice(words) for _ in range(rng.randint(min_words, max_words))).capitalize() + '.'
+        for _ in range(unique)
+    ]
+    return pd.DataFrame({'Content': [texts[rng.randrange(unique)] for _ in range(rows)]})
+
+
+def run_benchmark(args):
+    """在临时缓存库中运行基准测试，逐轮打印耗时和请求统计"""
+    if not args.keep_cache:
+        # 使用独立的临时缓存库，每次基准测试从冷缓存开始，结果可重复
+        utils.CACHE_DIR = tempfile.mkdtemp(prefix="translation_cache_bench_")
+        utils.CACHE_DB_FILE = os.path.join(utils.CACHE_DIR, "translation_cache.db")
+    
+    # --engines 大于1时每个模拟引擎（及其模拟服务）有独立的配额，用组合翻译器分摊请求
+    servers = []
+    members = []
+    for index in range(args.engines):
+        mock_options = {'seed': args.seed + index}
+        if args.server:
+            server, endpoint = start_mock_server(
+                latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                rate_limit=args.rate_limit, chars_per_second=args.chars_per_second, seed=args.seed + index
+            )
+            servers.append(server)
+            mock_options['endpoint'] = endpoint
+        else:
+            mock_options.update(latency=args.latency, error_rate=args.error_rate, chars_per_second=args.chars_per_second)
+        members.append({'engine': 'mock', 'mock_options': mock_options, 'requests_per_second': args.client_rps})
+    
+    if args.engines > 1:
+        engine_options = {'engine': 'composite', 'composite_options': {'members': members}}
+    else:
+        engine_options = {'engine': 'mock', 'mock_options': members[0]['mock_options'], 'requests_per_second': args.client_rps}
+    
+    df = make_benchmark_data(args.rows, args.unique, seed=args.seed)
+    print(f"数据: {len(df):,} 行，{df['Content'].nunique():,} 条不同文本，"
+          f"平均 {df['Content'].str.len().mean():.0f} 字符")
+    
+    for run in range(1, args.runs + 1):
+        start = time.perf_counter()
+        _, counts, _, errors = utils.translate_dataframe(
+            df, ['Content'], max_workers=args.workers, batch_size=args.batch_size, **engine_options
+        )
+        elapsed = time.perf_counter() - start
+        print(f"第 {run} 轮: {elapsed:.2f}s，{len(df) / elapsed:,.0f} 行/秒，"
+              f"翻译 {counts['translated']:,}，缓存命中 {counts['cached']:,}，失败 {counts['errors']:,}")
+        if errors and args.verbose:
+            for message in errors[:10]:
+                print(f"  {message}")
+    
+    for index, server in enumerate(servers, 1):
+        print(f"服务端 {index} 统计: {server.config.stats}")
+        server.shutdown()
+    if not args.keep_cache:
+        utils.get_cache_connection().close()
+        shutil.rmtree(utils.CACHE_DIR, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟翻译服务和离线性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    def add_behavior_arguments(subparser):
+        subparser.add_argument('--latency', type=float, default=0.05, help="每个请求的固定延迟（秒）")
+        subparser.add_argument('--error-rate', type=float, default=0.0, help="请求失败的概率（0-1）")
+        subparser.add_argument('--chars-per-second', type=float, help="每秒处理的字符数，模拟按长度增加的耗时")
+        subparser.add_argument('--seed', type=int, default=0, help="随机种子，保证结果可重复")
+    
+    serve_parser = subparsers.add_parser('serve', help="启动模拟翻译服务")
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--jitter', type=float, default=0.0, help="额外的随机延迟上限（秒）")
+    serve_parser.add_argument('--rate-limit', type=float, help="每秒允许的请求数，超出返回429")
+    add_behavior_arguments(serve_parser)
+    
+    bench_parser = subparsers.add_parser('benchmark', help="用模拟翻译引擎运行 translate_dataframe 基准测试")
+    bench_parser.add_argument('--rows', type=int, default=2000)
+    bench_parser.add_argument('--unique', type=int, default=500, help="不同文本的数量")
+    bench_parser.add_argument('--workers', type=int, default=utils.DEFAULT_MAX_WORKERS, help="并发请求数")
+    bench_parser.add_argument('--batch-size', type=int, default=1, help="每个批量请求的文本条数")
+    bench_parser.add_argument('--runs', type=int, default=2, help="运行轮数，第二轮起体现缓存效果")
+    bench_parser.add_argument('--client-rps', type=float, help="客户端限流的每秒请求数（每个模拟引擎）")
+    bench_parser.add_argument('--engines', type=int, default=1, help="模拟引擎数量，大于1时用组合翻译器轮询分摊请求")
+    bench_parser.add_argument('--server', action='store_true', help="经过本地HTTP模拟服务（含限流和连接池）")
+    bench_parser.add_argument('--jitter', type=float, default=0.0, help="额外的随机延迟上限（秒，仅 --server）")
+    bench_parser.add_argument('--rate-limit', type=float, help="服务端每秒允许的请求数（仅 --server）")
+    bench_parser.add_argument('--keep-cache', action='store_true', help="使用默认的缓存库，而不是临时缓存库")
+    bench_parser.add_argument('--verbose', action='store_true', help="打印失败请求的错误信息")
+    add_behavior_arguments(bench_parser)
+    
+    args = parser.parse_args()
+    
+    if args.command == 'serve':
+        server, endpoint = start_mock_server(
+            port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            rate_limit=args.rate_limit, chars_per_second=args.chars_per_second, seed=args.seed
+        )
+        print(f"模拟翻译服务已启动: {endpoint}/translate （Ctrl+C 停止）")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif args.command == 'benchmark':
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,20 @@ import io
 import time
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import get_download_data, create_translator, filter_dataframe, get_cache_stats, clear_expired_cache
+from utils import (
+    get_download_data, filter_dataframe, get_cache_stats, get_cache_tier_stats, start_cache_maintenance, ENGINE_RATE_LIMITS,
+    TENCENT_POOL_SIZE, DEFAULT_MAX_WORKERS, COMPOSITE_LONG_TEXT_CHARS, RESUMABLE_JOB_STATUSES, create_translation_job,
+    list_translation_jobs, delete_translation_job, is_valid_job_id, restore_job_engine_settings, load_translated_dataframe, get_job_runner,
+    load_translation_terms, save_translation_terms, export_cache_bundle, import_cache_bundle,
+    CACHE_BUNDLE_CONFLICT_RULES, LANGUAGE_NAMES, summarize_languages, register_dataset
+)
 from datetime import datetime
 import base64
 
+# 后台任务执行中时页面刷新进度的间隔（秒）
+JOB_POLL_INTERVAL = 1.0
+
+
 # 页面配置
 st.set_page_config(
     page_title="评论翻译工具",
@@ -113,164 +123,595 @@ def display_header():
     
     st.markdown(header_content, unsafe_allow_html=True)
 
-def translate_text(text, translator, max_retries=3):
-    """翻译单个文本，带重试机制和质量优化"""
-    if not text or pd.isna(text) or str(text).strip() == '':
-        return ''
-    
-    text = str(text).strip()
-    
-    # 预处理文本，提高翻译质量
-    text = preprocess_text_for_translation(text)
-    
-    for attempt in range(max_retries):
-        try:
-            # 如果文本太长，分段翻译
-            if len(text) > 4000:
-                # 按句子分割
-                sentences = text.split('. ')
-                translated_parts = []
-                current_part = ""
-                
-                for sentence in sentences:
-                    if len(current_part + sentence) < 4000:
-                        current_part += sentence + ". "
-                    else:
-                        if current_part:
-                            translated_parts.append(translator.translate(current_part.strip()))
-                        current_part = sentence + ". "
-                
-                if current_part:
-                    translated_parts.append(translator.translate(current_part.strip()))
-                
-                result = ' '.join(translated_parts)
-            else:
-                result = translator.translate(text)
-            
-            # 后处理翻译结果，提高质量
-            result = postprocess_translation(result)
-            
-            return result
-                
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)  # 等待1秒后重试
-                continue
-            else:
-                st.error(f"翻译失败: {str(e)}")
-                return f"[翻译错误: {text[:50]}...]"
+def render_cache_bundle_panel():
+    """缓存包导出/导入：把本机缓存分享给其他机器，新部署无需重新调用翻译API"""
+    with st.expander("📦 缓存导入导出", expanded=False):
+        engine_label = st.selectbox("导出引擎", ["全部", "Google翻译", "腾讯翻译API"], key="bundle_engine")
+        use_date_range = st.checkbox("按创建日期筛选", key="bundle_use_dates")
+        created_after = created_before = None
+        if use_date_range:
+            date_range = st.date_input("创建日期范围", value=(), key="bundle_dates")
+            if len(date_range) == 2:
+                created_after = datetime.combine(date_range[0], datetime.min.time())
+                created_before = datetime.combine(date_range[1], datetime.min.time()) + pd.Timedelta(days=1)
+        
+        if st.button("📤 生成缓存包", use_container_width=True):
+            engine = {"Google翻译": 'google', "腾讯翻译API": 'tencent'}.get(engine_label)
+            buffer = io.BytesIO()
+            count = export_cache_bundle(buffer, engine=engine, created_after=created_after, created_before=created_before)
+            st.session_state.cache_bundle = buffer.getvalue()
+            st.session_state.cache_bundle_count = count
+        
+        if st.session_state.get('cache_bundle'):
+            st.download_button(
+                label=f"⬇️ 下载缓存包（{st.session_state.cache_bundle_count:,} 条）",
+                data=st.session_state.cache_bundle,
+                file_name=f"translation_cache_{datetime.now().strftime('%Y%m%d')}.jsonl.gz",
+                mime="application/gzip",
+                use_container_width=True
+            )
+        
+        st.markdown("---")
+        
+        uploaded_bundle = st.file_uploader("导入缓存包", type=['gz'], key="bundle_upload")
+        conflict_labels = {'newer': "保留较新的译文", 'skip': "保留本地译文", 'overwrite': "使用缓存包中的译文"}
+        conflict = st.radio(
+            "缓存键冲突时",
+            CACHE_BUNDLE_CONFLICT_RULES,
+            format_func=conflict_labels.get,
+            key="bundle_conflict"
+        )
+        if uploaded_bundle is not None and st.button("📥 导入缓存包", use_container_width=True):
+            try:
+                result = import_cache_bundle(uploaded_bundle, conflict=conflict)
+                st.success(
+                    f"✅ 导入 {result['imported']:,} 条，跳过 {result['skipped']:,} 条，"
+                    f"过期 {result['expired']:,} 条"
+                )
+            except (ValueError, OSError) as e:
+                st.error(f"❌ 导入失败: {str(e)}")
 
-def preprocess_text_for_translation(text):
-    """预处理文本，提高翻译质量"""
-    # 移除多余的空白字符
-    text = ' '.join(text.split())
-    
-    # 处理常见的电商术语和缩写
-    text = text.replace('ASIN', 'ASIN')  # 保持ASIN不变
-    text = text.replace('USB-C', 'USB-C')  # 保持技术术语不变
-    text = text.replace('HDMI', 'HDMI')
-    text = text.replace('WiFi', 'WiFi')
-    text = text.replace('Bluetooth', 'Bluetooth')
-    
-    # 处理评分相关文本
-    text = text.replace('5 stars', '5星')
-    text = text.replace('4 stars', '4星')
-    text = text.replace('3 stars', '3星')
-    text = text.replace('2 stars', '2星')
-    text = text.replace('1 star', '1星')
-    
-    return text
+def render_term_table():
+    """编辑术语表：翻译前替换原文，翻译后修正译文"""
+    with st.expander("📖 术语表", expanded=False):
+        terms = load_translation_terms()
+        edited_terms = {}
+        
+        col1, col2 = st.columns(2)
+        for col, (key, title, source_label, target_label) in zip((col1, col2), (
+            ('source_replacements', "翻译前替换", "原文", "替换为"),
+            ('translation_corrections', "翻译后修正", "译文", "修正为"),
+        )):
+            with col:
+                st.markdown(f"**{title}**")
+                table = pd.DataFrame(list(terms[key].items()), columns=[source_label, target_label])
+                edited = st.data_editor(table, num_rows="dynamic", use_container_width=True, key=f"terms_{key}")
+                edited = edited.dropna(subset=[source_label])
+                edited_terms[key] = {
+                    str(source).strip(): '' if pd.isna(target) else str(target)
+                    for source, target in zip(edited[source_label], edited[target_label])
+                    if str(source).strip()
+                }
+        
+        if st.button("💾 保存术语表", use_container_width=True):
+            save_translation_terms(edited_terms)
+            st.success("术语表已保存")
 
-def postprocess_translation(translated_text):
-    """后处理翻译结果，提高质量"""
-    if not translated_text:
-        return translated_text
-    
-    # 修复常见的翻译错误
-    corrections = {
-        'ASIN': 'ASIN',  # 保持ASIN不变
-        'USB-C': 'USB-C',
-        'HDMI': 'HDMI',
-        'WiFi': 'WiFi',
-        'Bluetooth': 'Bluetooth',
-        '5星': '5星',
-        '4星': '4星',
-        '3星': '3星',
-        '2星': '2星',
-        '1星': '1星'
-    }
+def render_engine_settings():
+    """显示翻译引擎和参数设置，返回翻译任务所需的引擎参数"""
+    # 翻译引擎选择
+    st.markdown("""
+    <div class="translation-card">
+        <h4 style="color: #2E7D32; margin-bottom: 1rem;">🔧 翻译引擎设置</h4>
+    </div>
+    """, unsafe_allow_html=True)
     
-    for original, corrected in corrections.items():
-        translated_text = translated_text.replace(original, corrected)
+    col1, col2 = st.columns(2)
     
-    # 修复标点符号
-    translated_text = translated_text.replace('。。', '。')
-    translated_text = translated_text.replace('，，', '，')
-    translated_text = translated_text.replace('！！', '！')
-    translated_text = translated_text.replace('？？', '？')
+    with col1:
+        translation_engine = st.selectbox(
+            "选择翻译引擎",
+            ["Google翻译", "腾讯翻译API", "多引擎组合"],
+            help="Google翻译免费但可能不够准确，腾讯翻译API更准确但需要密钥；多引擎组合在多组腾讯密钥和Google之间分摊请求，提高总吞吐"
+        )
     
-    return translated_text
-
-def translate_dataframe(df, columns_to_translate, progress_bar, status_text, engine='google', secret_id=None, secret_key=None, filters=None):
-    """批量翻译DataFrame中的指定列"""
-    try:
-        translator = create_translator(engine, secret_id, secret_key)
-    except Exception as e:
-        st.error(f"创建翻译器失败: {str(e)}")
-        return df, 0, 0, 0
-    
-    # 应用筛选条件
-    if filters:
-        df = filter_dataframe(df, filters)
+    with col2:
+        if translation_engine == "腾讯翻译API":
+            st.info("⚠️ 腾讯翻译API需要配置密钥，请在下方输入")
+        elif translation_engine == "多引擎组合":
+            st.info("⚠️ 请在下方配置一组或多组腾讯翻译API密钥，某个引擎被限流时自动切换")
+        else:
+            st.success("✅ Google翻译无需配置，可直接使用")
     
-    # 创建翻译后的DataFrame副本
-    df_translated = df.copy()
-    
-    # 为每个要翻译的列创建对应的中文列
-    translation_mapping = {}
-    for col in columns_to_translate:
-        if col in df.columns:
-            chinese_col = f"{col}_中文"
-            df_translated[chinese_col] = ''
-            translation_mapping[col] = chinese_col
-    
-    total_rows = len(df)
-    translated_count = 0
-    error_count = 0
-    cached_count = 0
-    
-    # 获取缓存统计
-    cache_stats = get_cache_stats()
-    
-    # 翻译进度
-    for idx, row in df.iterrows():
-        try:
-            for original_col, chinese_col in translation_mapping.items():
-                if pd.notna(row[original_col]) and str(row[original_col]).strip():
-                    # 检查是否已有翻译
-                    if chinese_col in df_translated.columns and pd.notna(df_translated.at[idx, chinese_col]) and str(df_translated.at[idx, chinese_col]).strip():
-                        cached_count += 1
-                        continue
-                    
-                    translated_text = translate_text(row[original_col], translator)
-                    df_translated.at[idx, chinese_col] = translated_text
-            
-            translated_count += 1
+    # 腾讯翻译API配置
+    if translation_engine in ("腾讯翻译API", "多引擎组合"):
+        st.markdown("""
+        <div class="translation-card">
+            <h4 style="color: #2E7D32; margin-bottom: 1rem;">🔑 腾讯翻译API配置</h4>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        key_count = 1
+        if translation_engine == "多引擎组合":
+            key_count = st.number_input(
+                "密钥组数",
+                min_value=1,
+                max_value=10,
+                value=1,
+                help="每组密钥（腾讯云账号）有独立的配额，请求在各组之间轮询"
+            )
+        
+        key_pairs = []
+        for index in range(int(key_count)):
+            suffix = f" #{index + 1}" if key_count > 1 else ""
+            col1, col2 = st.columns(2)
             
-            # 更新进度
-            progress = (idx + 1) / total_rows
-            progress_bar.progress(progress)
-            status_text.text(f"正在翻译... {idx + 1}/{total_rows} ({progress:.1%}) - 缓存命中: {cached_count}")
+            with col1:
+                pair_id = st.text_input(
+                    f"SecretId{suffix}",
+                    type="password",
+                    key=f"tencent_secret_id_{index}",
+                    help="腾讯云API密钥ID"
+                )
             
-            # 添加小延迟避免API限制
-            time.sleep(0.1)
+            with col2:
+                pair_key = st.text_input(
+                    f"SecretKey{suffix}", 
+                    type="password",
+                    key=f"tencent_secret_key_{index}",
+                    help="腾讯云API密钥Key"
+                )
             
-        except Exception as e:
-            error_count += 1
-            st.error(f"第 {idx + 1} 行翻译失败: {str(e)}")
-            continue
+            if pair_id and pair_key:
+                key_pairs.append((pair_id, pair_key))
+        secret_id, secret_key = key_pairs[0] if key_pairs else (None, None)
+        
+        chars_per_second = st.number_input(
+            "每秒字符数上限",
+            min_value=1000,
+            max_value=100000,
+            value=ENGINE_RATE_LIMITS['tencent']['chars_per_second'],
+            step=1000,
+            help="本次翻译任务的每秒字符数上限（多组密钥时为每组的上限）；引擎的总配额由服务器统一设置，所有会话共享"
+        )
+        
+        pool_size = st.number_input(
+            "连接池大小",
+            min_value=1,
+            max_value=64,
+            value=TENCENT_POOL_SIZE,
+            help="复用的HTTPS长连接数量，建议不小于并发请求数"
+        )
+        
+        if not secret_id or not secret_key:
+            st.warning("⚠️ 请配置腾讯翻译API的SecretId和SecretKey")
+            st.markdown("""
+            <div style="background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 8px; padding: 1rem; margin: 1rem 0;">
+                <h5 style="color: #856404; margin-bottom: 0.5rem;">📋 如何获取腾讯翻译API密钥？</h5>
+                <ol style="color: #856404; font-size: 0.9rem; margin: 0; padding-left: 1.5rem;">
+                    <li>登录 <a href="https://console.cloud.tencent.com/" target="_blank">腾讯云控制台</a></li>
+                    <li>进入"访问管理" →"访问密钥" →"API密钥管理"</li>
+                    <li>创建新的API密钥</li>
+                    <li>复制SecretId和SecretKey</li>
+                    <li>确保已开通机器翻译服务</li>
+                </ol>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        key_pairs = []
+        secret_id = None
+        secret_key = None
+        chars_per_second = None
+        pool_size = TENCENT_POOL_SIZE
+    
+    # 多引擎组合：按长度分流，短文本可交给Google翻译，长文本交给腾讯翻译
+    short_text_engine = None
+    long_text_chars = COMPOSITE_LONG_TEXT_CHARS
+    if translation_engine == "多引擎组合":
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            use_google_for_short = st.checkbox(
+                "短文本使用Google翻译",
+                value=False,
+                help="短文本交给Google翻译，长文本交给腾讯翻译，节省腾讯翻译的字符配额"
+            )
+        
+        with col2:
+            long_text_chars = st.number_input(
+                "长文本阈值（字符）",
+                min_value=50,
+                max_value=5000,
+                value=COMPOSITE_LONG_TEXT_CHARS,
+                step=50,
+                disabled=not use_google_for_short,
+                help="超过该长度的文本交给腾讯翻译"
+            )
+        
+        if use_google_for_short:
+            short_text_engine = 'google'
+    
+    # 翻译参数设置
+    st.markdown("""
+    <div class="translation-card">
+        <h4 style="color: #2E7D32; margin-bottom: 1rem;">⚙️ 翻译参数设置</h4>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        batch_size = st.slider(
+            "批次大小",
+            min_value=10,
+            max_value=100,
+            value=50,
+            help="腾讯翻译API每次批量请求包含的文本条数（单次请求总长度不超过6000字符），较小的值更稳定但较慢"
+        )
+        
+        # 添加翻译质量设置
+        translation_quality = st.selectbox(
+            "翻译质量设置",
+            ["标准模式", "高质量模式", "快速模式"],
+            help="高质量模式会进行更多预处理和后处理，但速度较慢"
+        )
+    
+    with col2:
+        delay_time = st.slider(
+            "延迟时间 (秒)",
+            min_value=0.0,
+            max_value=2.0,
+            value=0.0,
+            step=0.1,
+            help="本次翻译任务两次请求之间的最小间隔（所有并发请求共享），0表示不额外限速；引擎的总配额由服务器统一设置，所有会话共享"
+        )
+        
+        max_workers = st.slider(
+            "并发请求数",
+            min_value=1,
+            max_value=16,
+            value=DEFAULT_MAX_WORKERS,
+            help="同时进行的翻译请求数，网络延迟越高，并发带来的提速越明显"
+        )
+        
+        # 添加专业术语处理选项
+        preserve_terms = st.checkbox(
+            "保持专业术语不变",
+            value=True,
+            help="翻译前后应用术语表（如评分文本替换、把被翻译的技术术语改回原文），术语表可在下方编辑"
+        )
+    
+    if preserve_terms:
+        render_term_table()
+    
+    requests_per_second = 1 / delay_time if delay_time > 0 else None
+    engine_settings = {
+        'engine': {"Google翻译": 'google', "腾讯翻译API": 'tencent', "多引擎组合": 'composite'}[translation_engine],
+        'secret_id': secret_id,
+        'secret_key': secret_key,
+        'max_workers': max_workers,
+        'batch_size': batch_size,
+        'requests_per_second': requests_per_second,
+        'chars_per_second': chars_per_second,
+        'pool_size': pool_size,
+        'terms': load_translation_terms() if preserve_terms else None,
+    }
+    if translation_engine == "多引擎组合":
+        engine_settings['composite_options'] = build_composite_options(
+            key_pairs, short_text_engine, long_text_chars, requests_per_second, chars_per_second, pool_size
+        )
+    return engine_settings
+
+def build_composite_options(key_pairs, short_text_engine, long_text_chars, requests_per_second, chars_per_second, pool_size):
+    """根据页面设置生成组合翻译器的成员配置（每组腾讯密钥一个成员）"""
+    tencent_members = [
+        {
+            'engine': 'tencent',
+            'secret_id': pair_id,
+            'secret_key': pair_key,
+            'requests_per_second': requests_per_second,
+            'chars_per_second': chars_per_second,
+            'pool_size': pool_size,
+        }
+        for pair_id, pair_key in key_pairs
+    ]
+    if short_text_engine and tencent_members:
+        return {
+            'members': [{'engine': short_text_engine, 'requests_per_second': requests_per_second}],
+            'long_members': tencent_members,
+            'long_text_chars': long_text_chars,
+        }
+    if short_text_engine:
+        return {'members': [{'engine': short_text_engine, 'requests_per_second': requests_per_second}]}
+    return {'members': tencent_members}
+
+def display_language_counts(language_counts):
+    """显示各语言的行数（中文和无文字内容的文本不调用翻译API）"""
+    total = sum(language_counts.values())
+    language_df = pd.DataFrame([
+        {
+            '语言': LANGUAGE_NAMES.get(language, language),
+            '行数': count,
+            '占比': f"{count / total * 100:.1f}%" if total else "0.0%"
+        }
+        for language, count in sorted(language_counts.items(), key=lambda item: item[1], reverse=True)
+    ])
+    st.dataframe(language_df, use_container_width=True, hide_index=True)
+
+def display_translation_results(df_translated, selected_columns, counts, language_counts=None):
+    """显示翻译完成后的统计和结果预览"""
+    translated_count = counts['translated']
+    error_count = counts['errors']
+    cached_count = counts['cached']
+    skipped_count = counts.get('skipped', 0)
+
+    st.markdown("""
+    <div class="success-box">
+        <h4 style="margin: 0; color: white;">✅ 翻译完成！</h4>
+        <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">所有选中的列已成功翻译为中文</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # 显示翻译统计
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("✅ 成功翻译", f"{translated_count:,}")
+    with col2:
+        st.metric("❌ 翻译失败", f"{error_count:,}")
+    with col3:
+        st.metric("💾 缓存命中", f"{cached_count:,}")
+    with col4:
+        st.metric("⏭️ 无需翻译", f"{skipped_count:,}")
+    with col5:
+        total_processed = translated_count + error_count + cached_count
+        success_rate = (translated_count / total_processed * 100) if total_processed > 0 else 0
+        st.metric("📊 成功率", f"{success_rate:.1f}%")
+    
+    if language_counts:
+        with st.expander("🌍 语言分布", expanded=False):
+            display_language_counts(language_counts)
+    
+    # 显示翻译后的数据预览
+    with st.expander("📋 查看翻译结果预览", expanded=True):
+        # 选择要显示的列
+        display_columns = []
+        for col in selected_columns:
+            display_columns.extend([col, f"{col}_中文"])
+        
+        # 添加其他重要列
+        important_cols = ['ID', 'Asin', 'Brand', 'Rating', 'Review Type']
+        for col in important_cols:
+            if col in df_translated.columns and col not in display_columns:
+                display_columns.append(col)
+        
+        # 重新排序列
+        final_columns = []
+        for col in df_translated.columns:
+            if col in display_columns:
+                final_columns.append(col)
+        
+        preview_df = df_translated[final_columns].head(10)
+        st.dataframe(preview_df, use_container_width=True)
+
+def get_current_job_id():
+    """当前会话正在查看的翻译任务ID（URL参数格式不正确时忽略）"""
+    job_id = st.session_state.get('translation_job_id') or st.query_params.get('job')
+    return job_id if is_valid_job_id(job_id) else None
+
+def get_session_job_ids():
+    """本会话创建或通过链接打开的翻译任务ID；服务器上其他用户的任务不在页面上列出"""
+    job_ids = st.session_state.setdefault('translation_job_ids', [])
+    job_id = get_current_job_id()
+    if job_id and job_id not in job_ids:
+        job_ids.append(job_id)
+    return job_ids
+
+def start_translation_job(job_id, engine_settings):
+    """把翻译任务提交到后台执行器，并在会话和URL中记录任务ID"""
+    get_job_runner().submit(job_id, engine_settings)
+    
+    # 刷新页面或重新连接后仍可查看同一任务的进度
+    st.session_state.translation_job_id = job_id
+    st.query_params['job'] = job_id
+    get_session_job_ids()
+    st.rerun()
+
+def submit_translation(df, selected_columns, engine_settings, filters=None):
+    """按筛选条件创建翻译任务并提交到后台执行"""
+    # 应用筛选条件；筛选后的数据登记为数据集，记录来源，翻译结果再以它为来源
+    dataset_id = st.session_state.get('processed_dataset_id')
+    if filters:
+        df = filter_dataframe(df, filters)
+        dataset_id = register_dataset(df, 'filtered', "翻译前筛选", parent=dataset_id, params=filters)
+    
+    job_id = create_translation_job(
+        df, selected_columns, engine_settings['engine'], source_dataset_id=dataset_id, engine_settings=engine_settings
+    )
+    start_translation_job(job_id, engine_settings)
+
+def render_job_status(engine_settings):
+    """显示当前会话翻译任务的状态，返回任务是否仍在后台执行"""
+    job_id = get_current_job_id()
+    if not job_id:
+        return False
     
-    return df_translated, translated_count, error_count, cached_count
+    job = get_job_runner().get_status(job_id)
+    if job is None:
+        return False
+    
+    st.markdown(f"""
+    <div class="translation-card">
+        <h4 style="color: #2E7D32; margin-bottom: 1rem;">📡 翻译任务 {job_id}</h4>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if job['active']:
+        progress = job['done_rows'] / max(job['total_rows'], 1)
+        st.progress(min(progress, 1.0))
+        st.text(f"{job['message']} - 总进度 {progress:.1%} - 缓存命中: {job['counts']['cached']}")
+        st.caption("任务在后台执行，可以离开本页面或关闭浏览器，稍后回来查看进度")
+        
+        if st.button("⏹️ 停止任务", use_container_width=True):
+            get_job_runner().stop(job_id)
+            st.info("当前行段完成并保存检查点后停止")
+        return True
+    
+    if job['status'] == 'completed':
+        # 每个任务的结果只加载一次
+        if st.session_state.get('translated_job_id') != job_id:
+            st.session_state.translated_df = load_translated_dataframe(job_id)
+            st.session_state.translated_job_id = job_id
+            # 登记为翻译数据集，分析页面可直接使用翻译结果；重试后译文有变化，指纹随统计变化
+            register_dataset(
+                st.session_state.translated_df, 'translated', f"翻译任务 {job_id}", parent=job.get('source_dataset_id'),
+                params={'job_id': job_id, 'counts': job['counts']}
+            )
+        
+        display_translation_results(
+            st.session_state.translated_df, job['columns'], job['counts'], job.get('languages')
+        )
+        
+        if job.get('messages'):
+            with st.expander(f"⚠️ 翻译错误信息 ({len(job['messages'])})", expanded=False):
+                for message in job['messages']:
+                    st.error(message)
+        
+        if job.get('retry_cells'):
+            st.warning(f"{job['retry_cells']:,} 个单元格翻译失败，已留空并加入重试队列")
+            # 使用任务创建时的引擎设置，当前页面缺少任务需要的密钥时不能重试
+            job_settings, missing = restore_job_engine_settings(job, engine_settings)
+            if missing:
+                st.caption(missing)
+            if st.button("🔁 重试失败的行", use_container_width=True, disabled=job_settings is None):
+                # 重新执行任务时只翻译重试队列中的单元格
+                st.session_state.translated_job_id = None
+                start_translation_job(job_id, job_settings)
+    else:
+        done_rows = sum(end - start for start, end in job['completed_chunks'])
+        reason = f"：{job['error']}" if job.get('error') else ""
+        st.warning(f"任务未完成{reason}（已完成 {done_rows:,}/{job['total_rows']:,} 行，已完成部分已保存）")
+        
+        job_settings, missing = restore_job_engine_settings(job, engine_settings)
+        if missing:
+            st.caption(missing)
+        if st.button("▶️ 继续任务", type="primary", use_container_width=True, disabled=job_settings is None):
+            start_translation_job(job_id, job_settings)
+    
+    return False
+
+def render_unfinished_jobs(engine_settings):
+    """列出本会话其他未完成的翻译任务，可从检查点继续或删除"""
+    runner = get_job_runner()
+    current_job_id = get_current_job_id()
+    jobs = [
+        job for job in list_translation_jobs(statuses=RESUMABLE_JOB_STATUSES, job_ids=get_session_job_ids())
+        if job['job_id'] != current_job_id and not runner.is_active(job['job_id'])
+    ]
+    if not jobs:
+        return
+    
+    st.markdown("""
+    <div class="translation-card">
+        <h4 style="color: #2E7D32; margin-bottom: 1rem;">🔄 未完成的翻译任务</h4>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    for job in jobs:
+        done_rows = sum(end - start for start, end in job['completed_chunks'])
+        col1, col2, col3 = st.columns([4, 1, 1])
+        with col1:
+            st.write(
+                f"**{job['job_id']}** · {job['engine']} · {', '.join(job['columns'])} · "
+                f"已完成 {done_rows:,}/{job['total_rows']:,} 行"
+            )
+        with col2:
+            job_settings, missing = restore_job_engine_settings(job, engine_settings)
+            if st.button("▶️ 继续", key=f"resume_{job['job_id']}", use_container_width=True,
+                         disabled=job_settings is None, help=missing):
+                start_translation_job(job['job_id'], job_settings)
+        with col3:
+            if st.button("🗑️ 删除", key=f"delete_{job['job_id']}", use_container_width=True):
+                delete_translation_job(job['job_id'])
+                st.rerun()
+
+def render_download_section():
+    """如果已有翻译结果，显示下载选项"""
+    if 'translated_df' not in st.session_state or st.session_state.translated_df is None:
+        return
+    
+    st.markdown("""
+    <div class="translation-card">
+        <h3 style="color: #2E7D32; margin-bottom: 1rem;">📥 下载翻译结果</h3>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    df_translated = st.session_state.translated_df
+    translated_columns = [col[:-len('_中文')] for col in df_translated.columns if col.endswith('_中文')]
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        file_format = st.radio(
+            "选择下载格式",
+            ["Excel", "Parquet", "TXT"],
+            help="Parquet保留数据类型，在其他页面上传时读取最快"
+        )
+    
+    with col2:
+        include_original = st.checkbox(
+            "包含原始英文列",
+            value=True,
+            help="是否在下载文件中包含原始英文列"
+        )
+    
+    # 准备下载数据
+    if include_original:
+        download_df = df_translated
+    else:
+        # 只保留中文列和其他非翻译列
+        chinese_columns = [col for col in df_translated.columns if col.endswith('_中文')]
+        other_columns = [col for col in df_translated.columns if not col.endswith('_中文') and col not in translated_columns]
+        download_df = df_translated[other_columns + chinese_columns]
+    
+    # 下载按钮
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        if file_format == "Excel":
+            file_data = get_download_data(download_df, 'excel')
+            st.download_button(
+                label="📥 下载翻译结果 (Excel)",
+                data=file_data,
+                file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                type="primary",
+                use_container_width=True
+            )
+        elif file_format == "Parquet":
+            file_data = get_download_data(download_df, 'parquet')
+            st.download_button(
+                label="📥 下载翻译结果 (Parquet)",
+                data=file_data,
+                file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+                mime="application/vnd.apache.parquet",
+                type="primary",
+                use_container_width=True
+            )
+        else:
+            file_data = get_download_data(download_df, 'txt')
+            st.download_button(
+                label="📥 下载翻译结果 (TXT)",
+                data=file_data,
+                file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+                mime="text/plain",
+                type="primary",
+                use_container_width=True
+            )
+    
+    # 清除翻译结果按钮
+    if st.button("🗑️ 清除翻译结果", use_container_width=True):
+        if 'translated_df' in st.session_state:
+            del st.session_state.translated_df
+        st.rerun()
 
 def main():
     # 显示头部
@@ -282,7 +723,7 @@ def main():
         <div style="background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%); color: white; padding: 1rem; border-radius: 10px; margin-bottom: 1rem;">
             <h3 style="color: white; margin-bottom: 0.5rem;">🌐 翻译设置</h3>
             <div style="font-size: 0.9rem; line-height: 1.6;">
-                <p><strong>源语言:</strong> 英语 (en)</p>
+                <p><strong>源语言:</strong> 自动检测（英语、西班牙语等）</p>
                 <p><strong>目标语言:</strong> 中文 (zh-CN)</p>
                 <p><strong>翻译引擎:</strong> Google/腾讯</p>
             </div>
@@ -300,15 +741,39 @@ def main():
         cache_stats = get_cache_stats()
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("📁 缓存文件", f"{cache_stats['valid_files']}/{cache_stats['total_files']}")
+            st.metric("📁 缓存条目", f"{cache_stats['valid_entries']}/{cache_stats['total_entries']}")
         with col2:
             st.metric("💾 缓存大小", f"{cache_stats['total_size_mb']:.1f}MB")
+        st.progress(
+            min(cache_stats['data_size_mb'] / cache_stats['max_size_mb'], 1.0),
+            text=f"缓存容量 {cache_stats['data_size_mb']:.1f}/{cache_stats['max_size_mb']:.0f}MB（超出后自动淘汰最久未使用的条目）"
+        )
+        
+        if cache_stats['expiry_histogram']:
+            with st.expander("📅 缓存过期分布", expanded=False):
+                st.bar_chart(pd.Series(cache_stats['expiry_histogram'], name="条目数"))
+        
+        # 内存层和SQLite层的命中情况（本进程启动以来）
+        tier_stats = get_cache_tier_stats()
+        col1, col2 = st.columns(2)
+        for col, label, tier in ((col1, "⚡ 内存命中", tier_stats['memory']), (col2, "💽 磁盘命中", tier_stats['disk'])):
+            with col:
+                st.metric(label, f"{tier['hits']:,}/{tier['hits'] + tier['misses']:,}")
+        st.caption(
+            f"内存缓存: {tier_stats['memory']['entries']:,} 条，"
+            f"{tier_stats['memory']['size_bytes'] / (1024 * 1024):.1f}MB"
+        )
         
         # 缓存管理按钮
-        if st.button("🗑️ 清理过期缓存", use_container_width=True):
-            clear_expired_cache()
-            st.success("✅ 过期缓存已清理")
-            st.rerun()
+        # 过期清理、容量淘汰和压缩由后台线程定期执行，按钮只是立即触发一次
+        cache_maintenance = start_cache_maintenance()
+        if cache_maintenance.last_run:
+            st.caption(f"上次自动维护: {cache_maintenance.last_run.strftime('%H:%M:%S')}")
+        if st.button("🗑️ 立即清理缓存", use_container_width=True):
+            cache_maintenance.run_now()
+            st.success("✅ 已在后台开始清理过期和超出容量的缓存")
+        
+        render_cache_bundle_panel()
         
         st.markdown("""
         <div style="background: rgba(76, 175, 80, 0.1); padding: 1rem; border-radius: 10px; border-left: 4px solid #4CAF50;">
@@ -379,6 +844,18 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
+        # 服务重启或会话丢失后，后台任务的进度和未完成的任务仍可查看和继续
+        job_id = get_current_job_id()
+        if job_id or list_translation_jobs(statuses=RESUMABLE_JOB_STATUSES, job_ids=get_session_job_ids()):
+            engine_settings = render_engine_settings()
+            job_active = render_job_status(engine_settings)
+            render_unfinished_jobs(engine_settings)
+            render_download_section()
+            
+            if job_active:
+                time.sleep(JOB_POLL_INTERVAL)
+                st.rerun()
+        
         return
     
     # 获取处理后的数据
@@ -412,8 +889,8 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # 获取文本列
-    text_columns = [col for col in df.columns if df[col].dtype == 'object' and col not in ['ID', 'Asin', 'Brand', 'Model', 'Rating', 'Date', 'Review Type']]
+    # 获取文本列（紧凑数据类型下文本列为Arrow字符串）
+    text_columns = [col for col in df.columns if (df[col].dtype == 'object' or isinstance(df[col].dtype, pd.StringDtype)) and col not in ['ID', 'Asin', 'Brand', 'Model', 'Rating', 'Date', 'Review Type']]
     
     if not text_columns:
         st.warning("没有找到可翻译的文本列")
@@ -587,6 +1064,14 @@ def main():
                         st.write(f"{i}. {text[:100]}{'...' if len(str(text)) > 100 else ''}")
                     st.write("---")
     
+        # 本地检测语言分布，开始翻译前即可知道多少行无需调用翻译API
+        with st.expander("🌍 语言分布", expanded=False):
+            st.caption("中文和无文字内容（表情、数字）的文本原样保留；其他语言按检测到的源语言翻译")
+            if st.button("🔍 检测语言", use_container_width=True):
+                st.session_state.language_counts = summarize_languages(preview_df, selected_columns)
+            if st.session_state.get('language_counts'):
+                display_language_counts(st.session_state.language_counts)
+    
     # 翻译控制
     st.markdown("""
     <div class="translation-card">
@@ -594,111 +1079,7 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # 翻译引擎选择
-    st.markdown("""
-    <div class="translation-card">
-        <h4 style="color: #2E7D32; margin-bottom: 1rem;">🔧 翻译引擎设置</h4>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        translation_engine = st.selectbox(
-            "选择翻译引擎",
-            ["Google翻译", "腾讯翻译API"],
-            help="Google翻译免费但可能不够准确，腾讯翻译API更准确但需要密钥"
-        )
-    
-    with col2:
-        if translation_engine == "腾讯翻译API":
-            st.info("⚠️ 腾讯翻译API需要配置密钥，请在下方输入")
-        else:
-            st.success("✅ Google翻译无需配置，可直接使用")
-    
-    # 腾讯翻译API配置
-    if translation_engine == "腾讯翻译API":
-        st.markdown("""
-        <div class="translation-card">
-            <h4 style="color: #2E7D32; margin-bottom: 1rem;">🔑 腾讯翻译API配置</h4>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            secret_id = st.text_input(
-                "SecretId",
-                type="password",
-                help="腾讯云API密钥ID"
-            )
-        
-        with col2:
-            secret_key = st.text_input(
-                "SecretKey", 
-                type="password",
-                help="腾讯云API密钥Key"
-            )
-        
-        if not secret_id or not secret_key:
-            st.warning("⚠️ 请配置腾讯翻译API的SecretId和SecretKey")
-            st.markdown("""
-            <div style="background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 8px; padding: 1rem; margin: 1rem 0;">
-                <h5 style="color: #856404; margin-bottom: 0.5rem;">📋 如何获取腾讯翻译API密钥？</h5>
-                <ol style="color: #856404; font-size: 0.9rem; margin: 0; padding-left: 1.5rem;">
-                    <li>登录 <a href="https://console.cloud.tencent.com/" target="_blank">腾讯云控制台</a></li>
-                    <li>进入"访问管理" →"访问密钥" →"API密钥管理"</li>
-                    <li>创建新的API密钥</li>
-                    <li>复制SecretId和SecretKey</li>
-                    <li>确保已开通机器翻译服务</li>
-                </ol>
-            </div>
-            """, unsafe_allow_html=True)
-    else:
-        secret_id = None
-        secret_key = None
-    
-    # 翻译参数设置
-    st.markdown("""
-    <div class="translation-card">
-        <h4 style="color: #2E7D32; margin-bottom: 1rem;">⚙️ 翻译参数设置</h4>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        batch_size = st.slider(
-            "批次大小",
-            min_value=10,
-            max_value=100,
-            value=50,
-            help="每批处理的记录数，较小的值更稳定但较慢"
-        )
-        
-        # 添加翻译质量设置
-        translation_quality = st.selectbox(
-            "翻译质量设置",
-            ["标准模式", "高质量模式", "快速模式"],
-            help="高质量模式会进行更多预处理和后处理，但速度较慢"
-        )
-    
-    with col2:
-        delay_time = st.slider(
-            "延迟时间 (秒)",
-            min_value=0.0,
-            max_value=2.0,
-            value=0.1,
-            step=0.1,
-            help="每次翻译之间的延迟时间，避免API限制"
-        )
-        
-        # 添加专业术语处理选项
-        preserve_terms = st.checkbox(
-            "保持专业术语不变",
-            value=True,
-            help="保持ASIN、USB-C等技术术语的原始形式"
-        )
+    engine_settings = render_engine_settings()
     
     # 翻译按钮
     if st.button("🌐 开始翻译", type="primary", use_container_width=True):
@@ -706,139 +1087,21 @@ def main():
             st.error("请选择要翻译的列")
             return
         
-        # 创建进度条和状态文本
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        try:
-            # 开始翻译
-            with st.spinner('正在初始化翻译引擎...'):
-                time.sleep(1)
-            
-            # 翻译数据
-            engine_name = 'google' if translation_engine == "Google翻译" else 'tencent'
-            df_translated, translated_count, error_count, cached_count = translate_dataframe(
-                df, selected_columns, progress_bar, status_text, engine=engine_name, secret_id=secret_id, secret_key=secret_key, filters=filters
-            )
-            
-            # 更新session state
-            st.session_state.translated_df = df_translated
-            
-            # 显示翻译结果
-            progress_bar.empty()
-            status_text.empty()
-            
-            st.markdown("""
-            <div class="success-box">
-                <h4 style="margin: 0; color: white;">✅ 翻译完成！</h4>
-                <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">所有选中的列已成功翻译为中文</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # 显示翻译统计
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("✅ 成功翻译", f"{translated_count:,}")
-            with col2:
-                st.metric("❌ 翻译失败", f"{error_count:,}")
-            with col3:
-                st.metric("💾 缓存命中", f"{cached_count:,}")
-            with col4:
-                total_processed = translated_count + error_count + cached_count
-                success_rate = (translated_count / total_processed * 100) if total_processed > 0 else 0
-                st.metric("📊 成功率", f"{success_rate:.1f}%")
-            
-            # 显示翻译后的数据预览
-            with st.expander("📋 查看翻译结果预览", expanded=True):
-                # 选择要显示的列
-                display_columns = []
-                for col in selected_columns:
-                    display_columns.extend([col, f"{col}_中文"])
-                
-                # 添加其他重要列
-                important_cols = ['ID', 'Asin', 'Brand', 'Rating', 'Review Type']
-                for col in important_cols:
-                    if col in df_translated.columns and col not in display_columns:
-                        display_columns.append(col)
-                
-                # 重新排序列
-                final_columns = []
-                for col in df_translated.columns:
-                    if col in display_columns:
-                        final_columns.append(col)
-                
-                preview_df = df_translated[final_columns].head(10)
-                st.dataframe(preview_df, use_container_width=True)
-            
-        except Exception as e:
-            st.error(f"翻译过程中出错: {str(e)}")
-            progress_bar.empty()
-            status_text.empty()
+        submit_translation(df, selected_columns, engine_settings, filters=filters)
+    
+    # 后台任务的进度和结果
+    job_active = render_job_status(engine_settings)
+    
+    # 未完成的任务可从检查点继续
+    render_unfinished_jobs(engine_settings)
     
     # 如果已有翻译结果，显示下载选项
-    if 'translated_df' in st.session_state and st.session_state.translated_df is not None:
-        st.markdown("""
-        <div class="translation-card">
-            <h3 style="color: #2E7D32; margin-bottom: 1rem;">📥 下载翻译结果</h3>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        df_translated = st.session_state.translated_df
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            file_format = st.radio(
-                "选择下载格式",
-                ["Excel", "TXT"],
-                help="选择适合的文件格式"
-            )
-        
-        with col2:
-            include_original = st.checkbox(
-                "包含原始英文列",
-                value=True,
-                help="是否在下载文件中包含原始英文列"
-            )
-        
-        # 准备下载数据
-        if include_original:
-            download_df = df_translated
-        else:
-            # 只保留中文列和其他非翻译列
-            chinese_columns = [col for col in df_translated.columns if col.endswith('_中文')]
-            other_columns = [col for col in df_translated.columns if not col.endswith('_中文') and col not in selected_columns]
-            download_df = df_translated[other_columns + chinese_columns]
-        
-        # 下载按钮
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            if file_format == "Excel":
-                file_data = get_download_data(download_df, 'excel')
-                st.download_button(
-                    label="📥 下载翻译结果 (Excel)",
-                    data=file_data,
-                    file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    type="primary",
-                    use_container_width=True
-                )
-            else:
-                file_data = get_download_data(download_df, 'txt')
-                st.download_button(
-                    label="📥 下载翻译结果 (TXT)",
-                    data=file_data,
-                    file_name=f"translated_reviews_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain",
-                    type="primary",
-                    use_container_width=True
-                )
-        
-        # 清除翻译结果按钮
-        if st.button("🗑️ 清除翻译结果", use_container_width=True):
-            if 'translated_df' in st.session_state:
-                del st.session_state.translated_df
-            st.rerun()
+    render_download_section()
+    
+    # 任务执行中时定期刷新页面以更新进度（不影响后台任务）
+    if job_active:
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
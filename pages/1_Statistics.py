@@ -7,7 +7,10 @@ from utils import (
     create_rating_heatmap,
     create_rating_trend_chart,
     save_fig_to_html,
-    create_rating_pie_chart
+    create_rating_pie_chart,
+    select_session_dataset,
+    open_page_dataset,
+    PROCESSED_DATA_COLUMNS
 )
 import plotly.express as px
 import plotly.graph_objects as go
@@ -203,25 +206,30 @@ def main():
 
     with st.container():
         st.markdown("### 📤 上传数据文件")
+    required_columns = ['ID', 'Asin', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        uploaded_file = st.file_uploader(
-            "选择预处理后的Excel文件", 
-            type=['xlsx'],
-            help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type"
-        )
+        # 首页处理过或其他页面上传过的数据集可直接使用
+        dataset_id = select_session_dataset(required_columns, key="statistics_dataset")
+        uploaded_file = None
+        if dataset_id is None:
+            uploaded_file = st.file_uploader(
+                "选择预处理后的Excel或Parquet文件", 
+                type=['xlsx', 'parquet'],
+                help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type"
+            )
         st.markdown('</div>', unsafe_allow_html=True)
     
-    if uploaded_file is not None:
+    if dataset_id is not None or uploaded_file is not None:
         try:
             # 显示文件信息
-            st.success("✅ 文件上传成功！正在处理数据...")
+            st.success("✅ 数据加载成功！正在处理数据...")
             
             with st.spinner('正在加载和验证数据...'):
-                df = pd.read_excel(uploaded_file)
+                df, load_message = open_page_dataset(dataset_id, uploaded_file, usecols=PROCESSED_DATA_COLUMNS)
+            st.caption(load_message)
             
             # 验证是否是预处理后的文件
-            required_columns = ['ID', 'Asin', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
             if not all(col in df.columns for col in required_columns):
                 st.error("❌ 请上传预处理后的文件！预处理后的文件应包含以下列：" + ", ".join(required_columns))
                 return
@@ -352,13 +360,13 @@ def main():
                         # 基础分组统计
                         if isinstance(group_by, list):
                             if all(col in df.columns for col in group_by):
-                                basic_stats = df.groupby(group_by)['Rating'].agg(['count', 'mean', 'std']).round(2)
+                                basic_stats = df.groupby(group_by, observed=True)['Rating'].agg(['count', 'mean', 'std']).round(2)
                             else:
                                 st.error("数据中缺少必要的列")
                                 basic_stats = pd.DataFrame()
                         else:
                             if group_by in df.columns:
-                                basic_stats = df.groupby(group_by)['Rating'].agg(['count', 'mean', 'std']).round(2)
+                                basic_stats = df.groupby(group_by, observed=True)['Rating'].agg(['count', 'mean', 'std']).round(2)
                             else:
                                 st.error("数据中缺少必要的列")
                                 basic_stats = pd.DataFrame()
@@ -14,6 +14,7 @@ import matplotlib.pyplot as plt
 from collections import Counter
 import re
 import plotly.graph_objects as go
+from utils import select_session_dataset, open_page_dataset
 import json
 import os
 import io
@@ -274,27 +275,32 @@ def main():
     
     # 文件上传卡片
     st.markdown("### 📤 上传数据文件")
+    required_columns = ['Content', 'Review Type']
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        uploaded_file = st.file_uploader(
-            "选择预处理后的Excel文件", 
-            type=['xlsx'],
-            help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type"
-        )
+        # 首页处理过或其他页面上传过的数据集可直接使用
+        dataset_id = select_session_dataset(required_columns, key="wordcloud_dataset")
+        uploaded_file = None
+        if dataset_id is None:
+            uploaded_file = st.file_uploader(
+                "选择预处理后的Excel或Parquet文件", 
+                type=['xlsx', 'parquet'],
+                help="请确保文件包含必要的列：ID, Asin, Title, Content, Model, Rating, Date, Review Type"
+            )
         st.markdown('</div>', unsafe_allow_html=True)
             
-    if uploaded_file is not None:
+    if dataset_id is not None or uploaded_file is not None:
         try:
             with st.spinner('正在加载数据...'):
-                df = pd.read_excel(uploaded_file)
+                df, load_message = open_page_dataset(dataset_id, uploaded_file, usecols=required_columns)
+            st.caption(load_message)
             
             # 验证文件格式
-            required_columns = ['Content', 'Review Type']
             if not all(col in df.columns for col in required_columns):
                 st.error("❌ 请上传包含Content和Review Type列的预处理文件！")
                 return
             
-            st.success(f"✅ 文件上传成功！共 {len(df)} 条评论")
+            st.success(f"✅ 数据加载成功！共 {len(df)} 条评论")
             
             # 选择评论类型
             st.markdown("### 🔍 选择分析范围")
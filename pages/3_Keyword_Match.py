@@ -13,6 +13,7 @@ import json
 import os
 from collections import defaultdict
 import plotly.graph_objects as go
+from utils import select_session_dataset, open_page_dataset
 
 # 预设人群类别和关键词
 PRESET_CATEGORIES = {
@@ -433,24 +434,29 @@ def main():
         st.markdown("---")
         st.markdown("### 📊 评论分析")
         
-        uploaded_file = st.file_uploader(
-            "选择预处理后的Excel文件", 
-            type=['xlsx'],
-            help="请上传包含ID、Content和Review Type列的Excel文件"
-        )
+        required_columns = ['ID', 'Content', 'Review Type']
+        # 首页处理过或其他页面上传过的数据集可直接使用
+        dataset_id = select_session_dataset(required_columns, key="keyword_dataset")
+        uploaded_file = None
+        if dataset_id is None:
+            uploaded_file = st.file_uploader(
+                "选择预处理后的Excel或Parquet文件", 
+                type=['xlsx', 'parquet'],
+                help="请上传包含ID、Content和Review Type列的Excel或Parquet文件（Parquet读取更快）"
+            )
         
-        if uploaded_file is not None:
+        if dataset_id is not None or uploaded_file is not None:
             try:
                 with st.spinner('正在处理文件...'):
-                    df = pd.read_excel(uploaded_file)
+                    df, load_message = open_page_dataset(dataset_id, uploaded_file, usecols=['ID', 'Content', 'Review Type', 'Rating'])
+                st.caption(load_message)
                 
                 # 验证文件格式
-                required_columns = ['ID', 'Content', 'Review Type']
                 if not all(col in df.columns for col in required_columns):
                     st.error("❌ 请上传包含ID、Content和Review Type列的预处理文件！")
                     return
                 
-                st.success(f"✅ 文件上传成功！共 {len(df)} 条评论")
+                st.success(f"✅ 数据加载成功！共 {len(df)} 条评论")
                 
                 # 分析评论
                 with st.spinner('正在分析评论...'):
@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def cache_db(tmp_path, monkeypatch):
+    """使用临时目录中的独立缓存库"""
+    monkeypatch.setattr(utils, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(utils, 'CACHE_DB_FILE', os.path.join(str(tmp_path), 'translation_cache.db'))
+    utils._cache_local.conn = None
+    yield utils.get_cache_connection()
+    utils._cache_local.conn.close()
+    utils._cache_local.conn = None
+
+
+def cache_bytes(conn):
+    return conn.execute("SELECT bytes FROM cache_stats WHERE id = 0").fetchone()[0]
+
+
+def test_evict_cache_stops_close_to_target(cache_db):
+    # 大小差别很大的条目：按平均大小估算条数会淘汰过多
+    now = time.time()
+    rows = [
+        (f"key-{index:04d}", ('x' * 500 if index % 10 == 0 else 'y'), 'mock', now, now + 86400, now + index)
+        for index in range(200)
+    ]
+    with cache_db:
+        cache_db.executemany(
+            "INSERT INTO translation_cache (cache_key, translation, engine, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    
+    max_bytes = cache_bytes(cache_db) // 2
+    target = max_bytes * utils.CACHE_EVICTION_TARGET
+    largest_entry = 8 + 500
+    
+    assert utils.evict_cache(max_bytes) > 0
+    size = cache_bytes(cache_db)
+    assert target - largest_entry < size <= target
+
+
+def test_evict_cache_removes_least_recently_used_first(cache_db):
+    now = time.time()
+    with cache_db:
+        cache_db.executemany(
+            "INSERT INTO translation_cache (cache_key, translation, engine, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(f"key-{index}", 'z' * 100, 'mock', now, now + 86400, now + index) for index in range(10)]
+        )
+    
+    utils.evict_cache(cache_bytes(cache_db) - 1)
+    remaining = {row[0] for row in cache_db.execute("SELECT cache_key FROM translation_cache")}
+    assert "key-0" not in remaining
+    assert "key-9" in remaining
+
+
+def test_evict_cache_under_limit_is_noop(cache_db):
+    utils.save_many({'key-a': 'a', 'key-b': 'b'}, engine='mock')
+    assert utils.evict_cache(10 ** 6) == 0
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from utils import detect_languages
+
+
+def detect(text):
+    return detect_languages(pd.Series([text], dtype=object)).iloc[0]
+
+
+@pytest.mark.parametrize('text', [
+    "Will die soon",
+    "Great value per dollar",
+    "ok con",
+    "The pros and con of this one",
+    "Non stick pan, works great",
+    "Works with my OS update",
+    "Bought it from amazon.com para my son",
+    "Um, it is fine I guess",
+    "Des Moines delivery was fast",
+    "MIT students love it",
+    "This is the best, la la la",
+])
+def test_english_reviews_with_foreign_looking_words_stay_english(text):
+    assert detect(text) == 'en'
+
+
+@pytest.mark.parametrize('text, language', [
+    ("El producto es muy bueno pero llegó tarde", 'es'),
+    ("Le produit est très bien mais un peu cher", 'fr'),
+    ("Das Produkt ist sehr gut und ich bin zufrieden", 'de'),
+    ("Il prodotto è molto buono, sono contento anche del prezzo", 'it'),
+    ("O produto é muito bom, você vai gostar", 'pt'),
+])
+def test_reviews_in_other_languages(text, language):
+    assert detect(text) == language
+
+
+def test_single_stopword_is_not_enough():
+    assert detect("Muy nice") == 'en'
+
+
+def test_scripts_and_empty_text():
+    languages = detect_languages(pd.Series(["质量很好", "とても良い製品です", "👍👍 5/5"], dtype=object))
+    assert languages.tolist() == ['zh', 'ja', 'none']
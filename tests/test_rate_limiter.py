@@ -0,0 +1,33 @@
+import threading
+import time
+
+from utils import RateLimiter
+
+
+def acquire_with_timeout(limiter, timeout, chars=0):
+    """在后台线程中调用 acquire，返回是否在 timeout 秒内返回"""
+    thread = threading.Thread(target=limiter.acquire, args=(chars,), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_first_request_below_one_per_second_is_immediate():
+    limiter = RateLimiter(requests_per_second=1 / 1.5)
+    start = time.monotonic()
+    assert acquire_with_timeout(limiter, 1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_requests_below_one_per_second_keep_the_gap():
+    limiter = RateLimiter(requests_per_second=1 / 1.2)
+    assert acquire_with_timeout(limiter, 1)
+    start = time.monotonic()
+    assert acquire_with_timeout(limiter, 3)
+    assert 1.0 < time.monotonic() - start < 2.0
+
+
+def test_configure_below_one_per_second_does_not_hang():
+    limiter = RateLimiter(requests_per_second=5)
+    limiter.configure(requests_per_second=0.5)
+    assert acquire_with_timeout(limiter, 3)
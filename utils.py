@@ -4,33 +4,251 @@ import plotly.express as px
 import plotly.graph_objects as go
 import io
 import hashlib
+import gzip
 import time
 import json
 import pickle
 import os
+import queue
+import random
+import re
+import shutil
+import sqlite3
+import threading
+import unicodedata
+import uuid
 from datetime import datetime, timedelta
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 缓存相关配置
 CACHE_DIR = "translation_cache"
+CACHE_DB_FILE = os.path.join(CACHE_DIR, "translation_cache.db")
 CACHE_EXPIRY_DAYS = 30  # 缓存过期天数
+CACHE_QUERY_CHUNK_SIZE = 500  # 批量查询时每条SQL的最大键数
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 内存缓存层的容量上限（字节）
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 持久化缓存的容量上限（缓存键和译文的字节数）
+CACHE_EVICTION_TARGET = 0.9  # 超过上限时淘汰到上限的该比例，避免频繁淘汰
+CACHE_EVICTION_BATCH = 500  # 每个事务淘汰的条目数，短事务不阻塞翻译任务写入
+CACHE_MAINTENANCE_INTERVAL = 600  # 后台清理过期、淘汰和压缩的间隔（秒）
+CACHE_ACCESS_BUFFER_MAX = 100000  # 等待批量写入的最近访问记录上限
+
+# 每个线程持有自己的SQLite连接（sqlite3连接不能跨线程共享）
+_cache_local = threading.local()
+
+class MemoryCache:
+    """按总字节数限制容量的LRU内存缓存（线程安全），进程内所有会话共享"""
+    
+    def __init__(self, max_bytes=MEMORY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _entry_size(cache_key, translation):
+        return len(cache_key) + len(translation.encode('utf-8'))
+    
+    def get(self, cache_key, now=None):
+        """查询缓存，命中时移到最近使用的位置；过期条目视为未命中并移除"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(cache_key)
+            self.misses += 1
+            return None
+    
+    def put(self, cache_key, translation, expires_at):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        size = self._entry_size(cache_key, translation)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            self._entries[cache_key] = (translation, expires_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+    
+    def _remove(self, cache_key):
+        _, _, size = self._entries.pop(cache_key)
+        self._bytes -= size
+    
+    def remove_expired(self, now=None):
+        """移除已过期的条目"""
+        now = now or time.time()
+        with self._lock:
+            for cache_key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+                self._remove(cache_key)
+    
+    def clear(self):
+        """清空缓存（不重置命中计数）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """条目数、占用字节数和命中/未命中计数"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# 持久化缓存层（SQLite）前的内存缓存层，写入时同时写入两层
+_memory_cache = MemoryCache()
+_disk_cache_counters = {'hits': 0, 'misses': 0}
+_disk_cache_counters_lock = threading.Lock()
+
+def _count_disk_lookups(hits, misses):
+    with _disk_cache_counters_lock:
+        _disk_cache_counters['hits'] += hits
+        _disk_cache_counters['misses'] += misses
+
+# 命中的缓存键先记录在内存中，由后台维护线程批量更新 last_access，查询时不写数据库
+_pending_cache_access = set()
+_pending_cache_access_lock = threading.Lock()
+
+def _record_cache_access(cache_keys):
+    with _pending_cache_access_lock:
+        for cache_key in cache_keys:
+            if len(_pending_cache_access) >= CACHE_ACCESS_BUFFER_MAX:
+                break
+            _pending_cache_access.add(cache_key)
 
 def ensure_cache_dir():
     """确保缓存目录存在"""
     if not os.path.exists(CACHE_DIR):
         os.makedirs(CACHE_DIR)
 
+def get_cache_connection():
+    """获取当前线程的缓存数据库连接（SQLite WAL模式）"""
+    conn = getattr(_cache_local, 'conn', None)
+    if conn is None:
+        ensure_cache_dir()
+        conn = sqlite3.connect(CACHE_DB_FILE, timeout=30)
+        # WAL模式下读写互不阻塞，适合多会话同时翻译
+        # 新建的缓存库支持增量回收空闲页（必须在写入任何内容之前设置，对已有的缓存库不生效）
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE 替换旧条目时也触发删除触发器，统计才不会重复计数
+        conn.execute("PRAGMA recursive_triggers=ON")
+        
+        # 建表和回填统计在同一个写事务中完成，避免与其他连接的写入交错
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                cache_key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                engine TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL
+            ) WITHOUT ROWID
+        """)
+        # 旧版缓存库没有最近访问时间，以创建时间代替
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(translation_cache)")}
+        if 'last_access' not in columns:
+            conn.execute("ALTER TABLE translation_cache ADD COLUMN last_access REAL")
+            conn.execute("UPDATE translation_cache SET last_access = created_at")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translation_cache_expires ON translation_cache(expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translation_cache_last_access ON translation_cache(last_access)")
+        create_cache_stats_schema(conn)
+        conn.commit()
+        _cache_local.conn = conn
+    return conn
+
+# 缓存条目占用的字节数（缓存键 + UTF-8编码的译文）
+CACHE_ENTRY_SIZE_SQL = "(length({row}.cache_key) + length(CAST({row}.translation AS BLOB)))"
+CACHE_EXPIRY_DAY_SQL = "CAST({row}.expires_at / 86400 AS INTEGER)"
+
+def create_cache_stats_schema(conn):
+    """创建由触发器增量维护的缓存统计表（条目数、字节数、按过期日期的直方图）"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            entries INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_expiry_histogram (
+            expiry_day INTEGER PRIMARY KEY,
+            entries INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )
+    """)
+    
+    add_entry = f"""
+        UPDATE cache_stats SET entries = entries + 1, bytes = bytes + {CACHE_ENTRY_SIZE_SQL.format(row='NEW')} WHERE id = 0;
+        INSERT INTO cache_expiry_histogram (expiry_day, entries, bytes)
+        VALUES ({CACHE_EXPIRY_DAY_SQL.format(row='NEW')}, 1, {CACHE_ENTRY_SIZE_SQL.format(row='NEW')})
+        ON CONFLICT(expiry_day) DO UPDATE SET entries = entries + 1, bytes = bytes + excluded.bytes;
+    """
+    remove_entry = f"""
+        UPDATE cache_stats SET entries = entries - 1, bytes = bytes - {CACHE_ENTRY_SIZE_SQL.format(row='OLD')} WHERE id = 0;
+        UPDATE cache_expiry_histogram SET entries = entries - 1, bytes = bytes - {CACHE_ENTRY_SIZE_SQL.format(row='OLD')}
+        WHERE expiry_day = {CACHE_EXPIRY_DAY_SQL.format(row='OLD')};
+        DELETE FROM cache_expiry_histogram WHERE expiry_day = {CACHE_EXPIRY_DAY_SQL.format(row='OLD')} AND entries <= 0;
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_cache_stats_insert AFTER INSERT ON translation_cache BEGIN {add_entry} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_cache_stats_delete AFTER DELETE ON translation_cache BEGIN {remove_entry} END")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_cache_stats_update "
+        "AFTER UPDATE OF cache_key, translation, expires_at ON translation_cache "
+        f"BEGIN {remove_entry} {add_entry} END"
+    )
+    
+    # 已有的缓存库首次创建统计表时，扫描一次回填
+    if conn.execute("SELECT 1 FROM cache_stats WHERE id = 0").fetchone() is None:
+        conn.execute(f"""
+            INSERT INTO cache_stats (id, entries, bytes)
+            SELECT 0, COUNT(*), COALESCE(SUM({CACHE_ENTRY_SIZE_SQL.format(row='translation_cache')}), 0)
+            FROM translation_cache
+        """)
+        conn.execute("DELETE FROM cache_expiry_histogram")
+        conn.execute(f"""
+            INSERT INTO cache_expiry_histogram (expiry_day, entries, bytes)
+            SELECT {CACHE_EXPIRY_DAY_SQL.format(row='translation_cache')}, COUNT(*),
+                   SUM({CACHE_ENTRY_SIZE_SQL.format(row='translation_cache')})
+            FROM translation_cache GROUP BY 1
+        """)
+
+CACHE_KEY_VERSION = 2  # 缓存键格式版本，写在键的前缀中
+
+def normalize_cache_text(text):
+    """缓存键使用的规范化文本：Unicode NFC、合并空白；不转换大小写（大小写可能影响译文）"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
 def get_cache_key(text, engine, source='en', target='zh'):
-    """生成缓存键"""
-    # 使用文本内容、引擎、语言对生成唯一键
+    """生成缓存键（规范化文本后哈希，带版本前缀）"""
+    # 各字段用不会出现在文本中的分隔符连接，避免不同字段组合出相同内容
+    content = '\x1f'.join((normalize_cache_text(text), engine, source, target))
+    return f"v{CACHE_KEY_VERSION}:{hashlib.md5(content.encode('utf-8')).hexdigest()}"
+
+def get_legacy_cache_key(text, engine, source='en', target='zh'):
+    """生成旧版（第1版）缓存键：直接哈希原始文本"""
     content = f"{text}_{engine}_{source}_{target}"
     return hashlib.md5(content.encode('utf-8')).hexdigest()
 
 def get_cache_file_path(cache_key):
-    """获取缓存文件路径"""
+    """获取旧版pickle缓存文件路径"""
     return os.path.join(CACHE_DIR, f"{cache_key}.pkl")
 
 def is_cache_valid(cache_file_path):
-    """检查缓存是否有效"""
+    """检查旧版pickle缓存文件是否有效"""
     if not os.path.exists(cache_file_path):
         return False
     
@@ -38,72 +256,702 @@ def is_cache_valid(cache_file_path):
     file_time = datetime.fromtimestamp(os.path.getmtime(cache_file_path))
     return datetime.now() - file_time < timedelta(days=CACHE_EXPIRY_DAYS)
 
-def save_to_cache(cache_key, translation):
+def save_to_cache(cache_key, translation, engine=None):
     """保存翻译结果到缓存"""
-    ensure_cache_dir()
-    cache_file_path = get_cache_file_path(cache_key)
+    conn = get_cache_connection()
+    now = time.time()
+    expires_at = now + CACHE_EXPIRY_DAYS * 86400
     
-    cache_data = {
-        'translation': translation,
-        'timestamp': datetime.now(),
-        'engine': 'google' if 'google' in cache_key else 'tencent'
-    }
-    
-    with open(cache_file_path, 'wb') as f:
-        pickle.dump(cache_data, f)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO translation_cache (cache_key, translation, engine, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (cache_key, translation, engine, now, expires_at, now)
+        )
+    _memory_cache.put(cache_key, translation, expires_at)
 
 def load_from_cache(cache_key):
-    """从缓存加载翻译结果"""
-    cache_file_path = get_cache_file_path(cache_key)
+    """从缓存加载翻译结果（先查内存层，再查SQLite）"""
+    now = time.time()
+    translation = _memory_cache.get(cache_key, now)
+    if translation is not None:
+        _record_cache_access((cache_key,))
+        return translation
+    
+    try:
+        row = get_cache_connection().execute(
+            "SELECT translation, expires_at FROM translation_cache WHERE cache_key = ? AND expires_at > ?",
+            (cache_key, now)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    
+    _count_disk_lookups(int(row is not None), int(row is None))
+    if row is None:
+        return None
+    _memory_cache.put(cache_key, row[0], row[1])
+    _record_cache_access((cache_key,))
+    return row[0]
+
+def load_many(cache_keys):
+    """批量从缓存加载翻译结果（先查内存层，再查SQLite），返回 {缓存键: 翻译} 的命中字典"""
+    cache_keys = list(dict.fromkeys(cache_keys))
+    now = time.time()
+    results = {}
     
-    if is_cache_valid(cache_file_path):
+    missing_keys = []
+    for cache_key in cache_keys:
+        translation = _memory_cache.get(cache_key, now)
+        if translation is not None:
+            results[cache_key] = translation
+        else:
+            missing_keys.append(cache_key)
+    if not missing_keys:
+        _record_cache_access(results)
+        return results
+    
+    conn = get_cache_connection()
+    disk_hits = 0
+    
+    # 分块查询，避免超过SQLite的参数个数上限
+    for start in range(0, len(missing_keys), CACHE_QUERY_CHUNK_SIZE):
+        chunk = missing_keys[start:start + CACHE_QUERY_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
         try:
-            with open(cache_file_path, 'rb') as f:
-                cache_data = pickle.load(f)
-            return cache_data['translation']
-        except:
-            return None
-    return None
+            rows = conn.execute(
+                f"SELECT cache_key, translation, expires_at FROM translation_cache "
+                f"WHERE cache_key IN ({placeholders}) AND expires_at > ?",
+                (*chunk, now)
+            ).fetchall()
+        except sqlite3.Error:
+            continue
+        for cache_key, translation, expires_at in rows:
+            results[cache_key] = translation
+            _memory_cache.put(cache_key, translation, expires_at)
+        disk_hits += len(rows)
+    
+    _count_disk_lookups(disk_hits, len(missing_keys) - disk_hits)
+    _record_cache_access(results)
+    return results
+
+def load_cached_translations(texts, engine, source='en', target='zh'):
+    """按文本批量查询缓存，返回 {文本: 译文}
+    
+    先查当前版本的缓存键，未命中的再查旧版缓存键；旧版命中的条目以新键重新保存，之后直接命中
+    """
+    keys = {text: get_cache_key(text, engine, source, target) for text in dict.fromkeys(texts)}
+    cached = load_many(keys.values())
+    results = {text: cached[key] for text, key in keys.items() if key in cached}
+    
+    legacy_keys = {
+        text: get_legacy_cache_key(text, engine, source, target)
+        for text in keys if text not in results
+    }
+    if legacy_keys:
+        legacy_cached = load_many(legacy_keys.values())
+        promoted = {}
+        for text, legacy_key in legacy_keys.items():
+            if legacy_key in legacy_cached:
+                results[text] = legacy_cached[legacy_key]
+                promoted[keys[text]] = legacy_cached[legacy_key]
+        save_many(promoted, engine=engine)
+    
+    return results
+
+def save_many(items, engine=None):
+    """批量保存翻译结果到缓存，items 为 {缓存键: 翻译} 或 (缓存键, 翻译) 序列"""
+    if isinstance(items, dict):
+        items = items.items()
+    now = time.time()
+    expires_at = now + CACHE_EXPIRY_DAYS * 86400
+    rows = [(cache_key, translation, engine, now, expires_at, now) for cache_key, translation in items]
+    if not rows:
+        return 0
+    
+    conn = get_cache_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO translation_cache (cache_key, translation, engine, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    for cache_key, translation, _, _, expires_at, _ in rows:
+        _memory_cache.put(cache_key, translation, expires_at)
+    return len(rows)
 
 def clear_expired_cache():
     """清理过期缓存"""
-    ensure_cache_dir()
-    current_time = datetime.now()
+    conn = get_cache_connection()
+    now = time.time()
+    with conn:
+        cursor = conn.execute("DELETE FROM translation_cache WHERE expires_at <= ?", (now,))
+    _memory_cache.remove_expired(now)
+    return cursor.rowcount
+
+def flush_cache_access():
+    """把内存中记录的最近访问批量写入 last_access，返回更新的条目数"""
+    with _pending_cache_access_lock:
+        cache_keys = list(_pending_cache_access)
+        _pending_cache_access.clear()
+    if not cache_keys:
+        return 0
     
-    for filename in os.listdir(CACHE_DIR):
-        if filename.endswith('.pkl'):
-            file_path = os.path.join(CACHE_DIR, filename)
-            file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            
-            if current_time - file_time > timedelta(days=CACHE_EXPIRY_DAYS):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
+    conn = get_cache_connection()
+    now = time.time()
+    for start in range(0, len(cache_keys), CACHE_QUERY_CHUNK_SIZE):
+        chunk = cache_keys[start:start + CACHE_QUERY_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        with conn:
+            conn.execute(
+                f"UPDATE translation_cache SET last_access = ? WHERE cache_key IN ({placeholders})",
+                (now, *chunk)
+            )
+    return len(cache_keys)
+
+def evict_cache(max_bytes=CACHE_MAX_BYTES):
+    """缓存超过容量上限时，按最近访问时间淘汰最久未使用的条目，返回淘汰的条目数"""
+    conn = get_cache_connection()
+    entries, size = conn.execute("SELECT entries, bytes FROM cache_stats WHERE id = 0").fetchone()
+    if size <= max_bytes:
+        return 0
+    
+    target = max_bytes * CACHE_EVICTION_TARGET
+    evicted = 0
+    while size > target and entries > 0:
+        # 在最久未使用的一批条目中按累计大小选出刚好超过多出字节数的条目，不按平均大小估算条数，
+        # 避免淘汰远多于需要的条目；每批一个短事务，翻译任务的写入只需等待一批
+        with conn:
+            cursor = conn.execute(f"""
+                DELETE FROM translation_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key, SUM(size) OVER (ORDER BY last_access, cache_key ROWS UNBOUNDED PRECEDING) - size AS freed_before
+                        FROM (
+                            SELECT cache_key, last_access, {CACHE_ENTRY_SIZE_SQL.format(row='translation_cache')} AS size
+                            FROM translation_cache ORDER BY last_access, cache_key LIMIT ?
+                        )
+                    ) WHERE freed_before < ?
+                )
+            """, (CACHE_EVICTION_BATCH, size - target))
+        if cursor.rowcount <= 0:
+            break
+        evicted += cursor.rowcount
+        entries, size = conn.execute("SELECT entries, bytes FROM cache_stats WHERE id = 0").fetchone()
+    return evicted
+
+def compact_cache():
+    """回收删除条目后的空闲页并截断WAL日志"""
+    conn = get_cache_connection()
+    # 只有以增量回收模式创建的缓存库才能在线回收空闲页，已有的缓存库需要离线VACUUM
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # executescript 会执行到底；execute 每次只回收一页
+        conn.executescript("PRAGMA incremental_vacuum;")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def run_cache_maintenance(max_bytes=CACHE_MAX_BYTES):
+    """执行一次缓存维护：写入访问记录、清理过期、按容量淘汰、压缩"""
+    flush_cache_access()
+    expired = clear_expired_cache()
+    evicted = evict_cache(max_bytes)
+    if expired or evicted:
+        compact_cache()
+    return {'expired': expired, 'evicted': evicted}
+
+class CacheMaintenanceThread(threading.Thread):
+    """后台缓存维护线程，定期执行 run_cache_maintenance，不占用翻译任务的线程"""
+    
+    def __init__(self, interval=CACHE_MAINTENANCE_INTERVAL, max_bytes=CACHE_MAX_BYTES):
+        super().__init__(name="translation-cache-maintenance", daemon=True)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.last_result = None
+        self.last_run = None
+        self._wake = threading.Event()
+    
+    def run_now(self):
+        """请求立即执行一次维护"""
+        self._wake.set()
+    
+    def run(self):
+        while True:
+            try:
+                self.last_result = run_cache_maintenance(self.max_bytes)
+                self.last_run = datetime.now()
+            except Exception as e:
+                # 任何错误（数据库、缓存目录、统计结果异常）都只记录下来，线程继续按周期维护
+                self.last_result = {'error': str(e)}
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+_cache_maintenance = None
+_cache_maintenance_lock = threading.Lock()
+
+def start_cache_maintenance():
+    """启动进程内唯一的后台缓存维护线程（重复调用返回同一线程）"""
+    global _cache_maintenance
+    with _cache_maintenance_lock:
+        if _cache_maintenance is None:
+            _cache_maintenance = CacheMaintenanceThread()
+            _cache_maintenance.start()
+        return _cache_maintenance
 
 def get_cache_stats():
-    """获取缓存统计信息"""
-    ensure_cache_dir()
+    """获取缓存统计信息（读取增量维护的统计表，不扫描缓存条目）"""
+    conn = get_cache_connection()
+    now = time.time()
+    today = int(now // 86400)
     
-    total_files = 0
-    valid_files = 0
-    total_size = 0
+    total_entries, data_size = conn.execute("SELECT entries, bytes FROM cache_stats WHERE id = 0").fetchone()
+    histogram = conn.execute(
+        "SELECT expiry_day, entries FROM cache_expiry_histogram ORDER BY expiry_day"
+    ).fetchall()
     
-    for filename in os.listdir(CACHE_DIR):
-        if filename.endswith('.pkl'):
-            file_path = os.path.join(CACHE_DIR, filename)
-            total_files += 1
-            total_size += os.path.getsize(file_path)
-            
-            if is_cache_valid(file_path):
-                valid_files += 1
+    # 今天之前过期的条目直接从直方图得到，今天过期的部分用索引范围计数
+    expired_entries = sum(entries for expiry_day, entries in histogram if expiry_day < today)
+    expired_entries += conn.execute(
+        "SELECT COUNT(*) FROM translation_cache WHERE expires_at >= ? AND expires_at <= ?",
+        (today * 86400, now)
+    ).fetchone()[0]
+    
+    # 数据库文件大小（含WAL日志）
+    total_size = 0
+    for path in (CACHE_DB_FILE, CACHE_DB_FILE + '-wal'):
+        if os.path.exists(path):
+            total_size += os.path.getsize(path)
     
     return {
-        'total_files': total_files,
-        'valid_files': valid_files,
-        'total_size_mb': total_size / (1024 * 1024)
+        'total_entries': total_entries,
+        'valid_entries': total_entries - expired_entries,
+        'total_size_mb': total_size / (1024 * 1024),
+        'data_size_mb': data_size / (1024 * 1024),
+        'max_size_mb': CACHE_MAX_BYTES / (1024 * 1024),
+        'expiry_histogram': {
+            datetime.fromtimestamp(expiry_day * 86400).strftime('%Y-%m-%d'): entries
+            for expiry_day, entries in histogram
+        }
     }
 
+def get_cache_tier_stats():
+    """获取内存层和SQLite层各自的命中/未命中计数"""
+    with _disk_cache_counters_lock:
+        disk = dict(_disk_cache_counters)
+    return {'memory': _memory_cache.stats(), 'disk': disk}
+
+def migrate_pickle_cache(cache_dir=CACHE_DIR, remove_files=False):
+    """将旧版逐条 .pkl 缓存文件导入SQLite缓存库"""
+    conn = get_cache_connection()
+    now = time.time()
+    imported = 0
+    skipped = 0
+    batch = []
+    migrated_files = []
+    
+    def flush():
+        with conn:
+            # 已存在的条目以SQLite中的为准，不被旧文件覆盖
+            conn.executemany(
+                "INSERT OR IGNORE INTO translation_cache (cache_key, translation, engine, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+        batch.clear()
+        
+        # 只删除已成功写入数据库的文件
+        if remove_files:
+            for path in migrated_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        migrated_files.clear()
+    
+    if not os.path.isdir(cache_dir):
+        return {'imported': 0, 'skipped': 0}
+    
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith('.pkl'):
+            continue
+        
+        try:
+            with open(entry.path, 'rb') as f:
+                cache_data = pickle.load(f)
+            translation = cache_data['translation']
+            timestamp = cache_data.get('timestamp')
+            created_at = timestamp.timestamp() if isinstance(timestamp, datetime) else entry.stat().st_mtime
+        except Exception:
+            skipped += 1
+            continue
+        
+        expires_at = created_at + CACHE_EXPIRY_DAYS * 86400
+        if translation is None or expires_at <= now:
+            skipped += 1
+            continue
+        
+        # 旧版缓存记录的engine字段不可靠（由哈希值推断），因此不导入
+        batch.append((entry.name[:-4], translation, None, created_at, expires_at, created_at))
+        migrated_files.append(entry.path)
+        imported += 1
+        if len(batch) >= 1000:
+            flush()
+    
+    if batch:
+        flush()
+    
+    return {'imported': imported, 'skipped': skipped}
+
+# 缓存包：gzip压缩的JSON Lines，首行为包信息，之后每行一个缓存条目
+CACHE_BUNDLE_FORMAT = "translation-cache-bundle"
+CACHE_BUNDLE_VERSION = 1
+CACHE_BUNDLE_CONFLICT_RULES = ('newer', 'skip', 'overwrite')
+
+def export_cache_bundle(fileobj, engine=None, created_after=None, created_before=None):
+    """把未过期的缓存条目（可按引擎、创建时间筛选）导出为压缩的缓存包，返回导出的条目数
+    
+    fileobj 为以二进制写入方式打开的文件对象；created_after/created_before 为 datetime
+    """
+    conditions = ["expires_at > ?"]
+    params = [time.time()]
+    if engine:
+        conditions.append("engine = ?")
+        params.append(engine)
+    if created_after:
+        conditions.append("created_at >= ?")
+        params.append(created_after.timestamp())
+    if created_before:
+        conditions.append("created_at < ?")
+        params.append(created_before.timestamp())
+    
+    conn = get_cache_connection()
+    where = " AND ".join(conditions)
+    count = conn.execute(f"SELECT COUNT(*) FROM translation_cache WHERE {where}", params).fetchone()[0]
+    
+    with gzip.GzipFile(fileobj=fileobj, mode='wb') as gz:
+        header = {
+            'format': CACHE_BUNDLE_FORMAT,
+            'version': CACHE_BUNDLE_VERSION,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'entries': count,
+            'filters': {
+                'engine': engine,
+                'created_after': created_after.isoformat() if created_after else None,
+                'created_before': created_before.isoformat() if created_before else None
+            }
+        }
+        gz.write((json.dumps(header, ensure_ascii=False) + '\n').encode('utf-8'))
+        
+        cursor = conn.execute(
+            f"SELECT cache_key, translation, engine, created_at, expires_at FROM translation_cache WHERE {where}",
+            params
+        )
+        for cache_key, translation, entry_engine, created_at, expires_at in cursor:
+            row = {'k': cache_key, 't': translation, 'e': entry_engine, 'c': created_at, 'x': expires_at}
+            gz.write((json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8'))
+    
+    return count
+
+def import_cache_bundle(fileobj, conflict='newer'):
+    """把缓存包合并到本地缓存，返回 {'imported', 'skipped', 'expired'}
+    
+    conflict 为本地已有相同缓存键时的处理规则：
+    'newer' 保留创建时间较新的译文，'skip' 保留本地译文，'overwrite' 使用缓存包中的译文
+    """
+    if conflict not in CACHE_BUNDLE_CONFLICT_RULES:
+        raise ValueError(f"不支持的冲突处理规则: {conflict}")
+    
+    columns = "(cache_key, translation, engine, created_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)"
+    if conflict == 'skip':
+        sql = f"INSERT OR IGNORE INTO translation_cache {columns}"
+    elif conflict == 'overwrite':
+        sql = f"INSERT OR REPLACE INTO translation_cache {columns}"
+    else:
+        sql = (
+            f"INSERT INTO translation_cache {columns} ON CONFLICT(cache_key) DO UPDATE SET "
+            "translation = excluded.translation, engine = excluded.engine, "
+            "created_at = excluded.created_at, expires_at = excluded.expires_at "
+            "WHERE excluded.created_at > translation_cache.created_at"
+        )
+    
+    conn = get_cache_connection()
+    now = time.time()
+    stats = {'imported': 0, 'skipped': 0, 'expired': 0}
+    batch = []
+    
+    def flush():
+        with conn:
+            # rowcount 不包含触发器的改动，只统计实际写入的条目
+            imported = conn.executemany(sql, batch).rowcount
+        stats['imported'] += imported
+        stats['skipped'] += len(batch) - imported
+        batch.clear()
+    
+    with gzip.GzipFile(fileobj=fileobj, mode='rb') as gz:
+        header = json.loads(gz.readline() or b'{}')
+        if header.get('format') != CACHE_BUNDLE_FORMAT:
+            raise ValueError("不是有效的翻译缓存包")
+        if header.get('version', 0) > CACHE_BUNDLE_VERSION:
+            raise ValueError(f"缓存包版本 {header['version']} 高于当前支持的版本 {CACHE_BUNDLE_VERSION}")
+        
+        for line in gz:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row['x'] <= now:
+                stats['expired'] += 1
+                continue
+            batch.append((row['k'], row['t'], row.get('e'), row['c'], row['x'], row['c']))
+            if len(batch) >= 1000:
+                flush()
+    
+    if batch:
+        flush()
+    
+    # 内存层可能保存着被覆盖的旧译文
+    if conflict != 'skip':
+        _memory_cache.clear()
+    
+    return stats
+
+# 翻译任务检查点配置
+JOB_DIR = "translation_jobs"
+JOB_CHUNK_ROWS = 500  # 每完成多少行保存一次检查点
+MAX_JOB_MESSAGES = 200  # 每个任务最多保留的错误信息条数
+RESUMABLE_JOB_STATUSES = ('pending', 'queued', 'running', 'interrupted', 'failed')  # 可以从检查点继续的任务状态
+CIRCUIT_OPEN_MESSAGE = "翻译引擎错误率过高，任务已暂停，请稍后从检查点继续"
+JOB_ID_PATTERN = re.compile(r'^\d{8}_\d{6}_[0-9a-f]{6}$')  # create_translation_job 生成的任务ID格式
+
+_jobs_lock = threading.Lock()
+
+def is_valid_job_id(job_id):
+    """任务ID是否符合 create_translation_job 生成的格式（任务ID可能来自URL参数，不能直接拼接路径）"""
+    return isinstance(job_id, str) and JOB_ID_PATTERN.fullmatch(job_id) is not None
+
+def _get_job_dir(job_id):
+    """获取翻译任务的存储目录，任务ID格式不正确时抛出 ValueError"""
+    if not is_valid_job_id(job_id):
+        raise ValueError(f"无效的翻译任务ID: {job_id!r}")
+    return os.path.join(JOB_DIR, job_id)
+
+def _write_job(job):
+    """原子写入任务信息，避免中途崩溃留下损坏的文件"""
+    job['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    job_file = os.path.join(_get_job_dir(job['job_id']), 'job.json')
+    tmp_file = job_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, job_file)
+
+def _secret_id_hash(secret_id):
+    """SecretId的短摘要，用于区分多组密钥（不保存或显示密钥本身）"""
+    return hashlib.md5(secret_id.encode('utf-8')).hexdigest()[:8]
+
+def _without_secrets(settings):
+    """去掉一组引擎参数中的密钥，有SecretId时只记录它的摘要"""
+    stripped = {name: value for name, value in settings.items() if name not in ('secret_id', 'secret_key')}
+    if settings.get('secret_id'):
+        stripped['secret_id_hash'] = _secret_id_hash(settings['secret_id'])
+    return stripped
+
+def get_job_engine_settings(engine_settings):
+    """保存到任务信息中的引擎设置（job.json 为明文，不含密钥），包括组合翻译器的成员、限速、批次大小和并发数"""
+    settings = _without_secrets(engine_settings)
+    if settings.get('composite_options'):
+        options = dict(settings['composite_options'])
+        for group in ('members', 'long_members'):
+            if group in options:
+                options[group] = [_without_secrets(member) for member in options[group]]
+        settings['composite_options'] = options
+    return settings
+
+def restore_job_engine_settings(job, current_settings):
+    """继续或重试任务时使用任务创建时保存的引擎设置，密钥从当前页面的设置中按SecretId摘要找回
+    
+    返回 (引擎设置, None)；当前页面缺少任务需要的密钥时返回 (None, 原因说明)
+    """
+    saved = job.get('engine_settings')
+    if saved is None:
+        # 没有保存引擎设置的旧任务只能用相同引擎的当前设置继续
+        if current_settings.get('engine') != job['engine']:
+            return None, f"该任务创建时未保存引擎设置，请把翻译引擎切换为 {job['engine']} 后继续"
+        return current_settings, None
+    
+    # 当前页面提供的所有密钥（单引擎和组合翻译器的成员），按SecretId摘要索引
+    available = {}
+    for settings in [current_settings] + [
+        member for group in ('members', 'long_members')
+        for member in (current_settings.get('composite_options') or {}).get(group, [])
+    ]:
+        if settings.get('secret_id') and settings.get('secret_key'):
+            available[_secret_id_hash(settings['secret_id'])] = (settings['secret_id'], settings['secret_key'])
+    
+    missing = []
+    
+    def restore(settings):
+        settings = dict(settings)
+        secret_hash = settings.pop('secret_id_hash', None)
+        if settings['engine'] == 'tencent':
+            if secret_hash in available:
+                settings['secret_id'], settings['secret_key'] = available[secret_hash]
+            else:
+                missing.append(secret_hash or '未知')
+        return settings
+    
+    settings = restore(saved)
+    if settings.get('composite_options'):
+        options = dict(settings['composite_options'])
+        for group in ('members', 'long_members'):
+            if group in options:
+                options[group] = [restore(member) for member in options[group]]
+        settings['composite_options'] = options
+    
+    if missing:
+        return None, f"需要任务使用的腾讯云密钥（SecretId摘要 {', '.join(missing)}），请在翻译引擎设置中填写后再继续"
+    return settings, None
+
+def create_translation_job(df, columns, engine, chunk_rows=JOB_CHUNK_ROWS, source_dataset_id=None, engine_settings=None):
+    """创建可断点续传的翻译任务，保存待翻译数据，返回任务ID
+    
+    source_dataset_id 为待翻译数据在数据集注册表中的ID；engine_settings 为执行任务的引擎设置，
+    去掉密钥后保存在任务信息中，继续任务时见 restore_job_engine_settings
+    """
+    job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    os.makedirs(_get_job_dir(job_id))
+    df.to_pickle(os.path.join(_get_job_dir(job_id), 'input.pkl'))
+    
+    job = {
+        'job_id': job_id,
+        'status': 'pending',
+        'engine': engine,
+        'columns': list(columns),
+        'total_rows': len(df),
+        'chunk_rows': chunk_rows,
+        'completed_chunks': [],
+        'counts': {'translated': 0, 'errors': 0, 'cached': 0, 'skipped': 0},
+        'languages': {},
+        'source_dataset_id': source_dataset_id,
+        'engine_settings': get_job_engine_settings(engine_settings) if engine_settings else None,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with _jobs_lock:
+        _write_job(job)
+    return job_id
+
+def load_translation_job(job_id):
+    """读取翻译任务信息，不存在或任务ID无效时返回None"""
+    if not is_valid_job_id(job_id):
+        return None
+    job_file = os.path.join(_get_job_dir(job_id), 'job.json')
+    try:
+        with open(job_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def update_translation_job(job_id, **fields):
+    """更新翻译任务的字段（如状态）"""
+    with _jobs_lock:
+        job = load_translation_job(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        _write_job(job)
+        return job
+
+def load_job_input(job_id):
+    """读取翻译任务的待翻译数据"""
+    return pd.read_pickle(os.path.join(_get_job_dir(job_id), 'input.pkl'))
+
+def get_pending_job_chunks(job):
+    """返回任务中尚未完成的行范围列表 [(起始行, 结束行), ...]"""
+    completed = {tuple(chunk) for chunk in job['completed_chunks']}
+    return [
+        (start, min(start + job['chunk_rows'], job['total_rows']))
+        for start in range(0, job['total_rows'], job['chunk_rows'])
+        if (start, min(start + job['chunk_rows'], job['total_rows'])) not in completed
+    ]
+
+def _save_retry_cells(job_id, start, failed):
+    """保存行段中翻译失败的单元格（重试队列），没有失败时删除重试文件"""
+    retry_file = os.path.join(_get_job_dir(job_id), f'retry_{start:08d}.pkl')
+    if failed is not None and len(failed):
+        failed.to_pickle(retry_file)
+    elif os.path.exists(retry_file):
+        os.remove(retry_file)
+
+def save_job_chunk(job_id, start, end, chunk_result, counts, messages=(), languages=None, failed=None):
+    """保存一段已完成行的翻译结果（检查点）和失败的单元格，并累加统计、语言分布和错误信息"""
+    chunk_result.to_pickle(os.path.join(_get_job_dir(job_id), f'chunk_{start:08d}.pkl'))
+    
+    with _jobs_lock:
+        job = load_translation_job(job_id)
+        # 同一任务被重复继续时，已记录的行范围不重复计数
+        if [start, end] not in job['completed_chunks']:
+            _save_retry_cells(job_id, start, failed)
+            job['completed_chunks'].append([start, end])
+            for name, value in counts.items():
+                job['counts'][name] = job['counts'].get(name, 0) + value
+            for language, value in (languages or {}).items():
+                job.setdefault('languages', {})
+                job['languages'][language] = job['languages'].get(language, 0) + value
+            job['messages'] = (job.get('messages', []) + list(messages))[-MAX_JOB_MESSAGES:]
+            job['retry_cells'] = job.get('retry_cells', 0) + (len(failed) if failed is not None else 0)
+            _write_job(job)
+        return job
+
+def load_retry_queue(job_id):
+    """读取任务的重试队列，返回 {行段起始行: 失败单元格DataFrame(row, column)}"""
+    job_dir = _get_job_dir(job_id)
+    queue = {}
+    for name in sorted(os.listdir(job_dir)):
+        if name.startswith('retry_') and name.endswith('.pkl'):
+            queue[int(name[len('retry_'):-len('.pkl')])] = pd.read_pickle(os.path.join(job_dir, name))
+    return queue
+
+def save_job_retry(job_id, start, failed, result, remaining, messages=()):
+    """把重试成功的单元格写回行段检查点，更新重试队列和统计"""
+    chunk_file = os.path.join(_get_job_dir(job_id), f'chunk_{start:08d}.pkl')
+    chunk_result = pd.read_pickle(chunk_file)
+    
+    # 只回填之前失败、这次成功的单元格，其余单元格保持检查点中的结果
+    remaining_cells = set(zip(remaining['row'], remaining['column']))
+    fixed = failed[[cell not in remaining_cells for cell in zip(failed['row'], failed['column'])]]
+    for column, cells in fixed.groupby('column'):
+        chunk_result.loc[cells['row'], column] = result.loc[cells['row'], column]
+    chunk_result.to_pickle(chunk_file)
+    
+    with _jobs_lock:
+        _save_retry_cells(job_id, start, failed[~failed.index.isin(fixed.index)])
+        job = load_translation_job(job_id)
+        job['counts']['translated'] += len(fixed)
+        job['counts']['errors'] -= len(fixed)
+        job['retry_cells'] = max(job.get('retry_cells', 0) - len(fixed), 0)
+        job['messages'] = (job.get('messages', []) + list(messages))[-MAX_JOB_MESSAGES:]
+        _write_job(job)
+        return job
+
+def load_job_results(job_id):
+    """合并任务所有已完成行的翻译结果"""
+    job = load_translation_job(job_id)
+    chunks = [
+        pd.read_pickle(os.path.join(_get_job_dir(job_id), f'chunk_{start:08d}.pkl'))
+        for start, _ in sorted(job['completed_chunks'])
+    ]
+    return pd.concat(chunks) if chunks else None
+
+def list_translation_jobs(statuses=None, job_ids=None):
+    """列出翻译任务（按创建时间倒序），可按状态和任务ID过滤"""
+    if not os.path.isdir(JOB_DIR):
+        return []
+    
+    jobs = []
+    for job_id in os.listdir(JOB_DIR) if job_ids is None else job_ids:
+        job = load_translation_job(job_id)
+        if job and (statuses is None or job['status'] in statuses):
+            jobs.append(job)
+    return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+def delete_translation_job(job_id):
+    """删除翻译任务及其检查点文件"""
+    shutil.rmtree(_get_job_dir(job_id), ignore_errors=True)
+
 def filter_dataframe(df, filters):
     """根据筛选条件过滤DataFrame"""
     filtered_df = df.copy()
@@ -124,13 +972,373 @@ def filter_dataframe(df, filters):
     
     return filtered_df
 
-def process_data(df, brand_df=None):
-    """数据预处理函数"""
+# 数据文件读取相关配置
+RAW_DATA_COLUMNS = ['Asin', 'Title', 'Content', 'Model', 'Rating', 'Date']  # prepare_review_data 需要的原始列
+PROCESSED_DATA_COLUMNS = ['ID', 'Asin', 'Brand', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
+BRAND_DATA_COLUMNS = ['ASIN', 'Brand']
+MEMORY_SAMPLE_INTERVAL = 0.01  # 读取文件时采样进程内存的间隔（秒）
+
+def get_excel_engine():
+    """可用的最快Excel读取引擎：安装了 python-calamine（Rust实现）时用 calamine，否则用 openpyxl 只读流式读取"""
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
+def _get_rss_bytes():
+    """当前进程的常驻内存（字节），无法获取时返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+class PeakMemorySampler:
+    """后台线程定期采样进程内存，记录 with 代码块执行期间相对开始时的内存峰值增量（peak_bytes）
+    
+    tracemalloc 会让解析慢数倍，且统计不到calamine在Rust中的分配，所以采样常驻内存
+    """
+    
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_bytes = None
+        self._stop = threading.Event()
+    
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, _get_rss_bytes())
+    
+    def __enter__(self):
+        self._baseline = _get_rss_bytes()
+        if self._baseline is not None:
+            self._peak = self._baseline
+            self._thread = threading.Thread(target=self._sample, name="memory-sampler", daemon=True)
+            self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self._baseline is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_bytes = max(self._peak, _get_rss_bytes()) - self._baseline
+        return False
+
+def _read_excel_openpyxl(fileobj, usecols=None):
+    """用 openpyxl 只读模式逐行读取第一个工作表，只保留 usecols 中的列，不在内存中保留整张表的单元格"""
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        names = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        indices = [i for i, name in enumerate(names) if usecols is None or name in usecols]
+        if not indices:
+            return pd.DataFrame(columns=[])
+        
+        data = []
+        # 只迭代到最后一个需要的列，右侧的列不解析
+        for row in sheet.iter_rows(min_row=2, max_col=max(indices) + 1, values_only=True):
+            values = [row[i] if i < len(row) else None for i in indices]
+            if any(value is not None for value in values):
+                data.append(values)
+    finally:
+        workbook.close()
+    
+    return pd.DataFrame(data, columns=[names[i] for i in indices]).infer_objects()
+
+def _read_parquet(fileobj, usecols=None):
+    """读取Parquet文件中 usecols 里存在的列，保留写入时的数据类型（日期、分类等）"""
+    import pyarrow.parquet as pq
+    
+    parquet_file = pq.ParquetFile(fileobj)
+    columns = None
+    if usecols is not None:
+        columns = [name for name in parquet_file.schema_arrow.names if name in usecols]
+    return parquet_file.read(columns=columns, use_pandas_metadata=True).to_pandas()
+
+def read_data_file(uploaded_file, usecols=None, engine=None):
+    """读取上传的Excel、Parquet或CSV文件，只解析 usecols 中的列（文件中没有的列忽略）
+    
+    engine 为None时自动选择（见 get_excel_engine）。返回 (DataFrame, 读取统计)，读取统计为
+    {'engine', 'seconds', 'peak_mb', 'rows', 'columns'}，peak_mb 为读取期间的进程内存峰值增量
+    """
+    name = getattr(uploaded_file, 'name', str(uploaded_file)).lower()
+    if hasattr(uploaded_file, 'seek'):
+        # 同一个上传文件在页面重跑时会被再次读取
+        uploaded_file.seek(0)
+    column_filter = (lambda col: col in usecols) if usecols is not None else None
+    
+    if name.endswith('.csv'):
+        engine = 'csv'
+    elif name.endswith('.parquet'):
+        engine = 'parquet'
+    else:
+        engine = engine or get_excel_engine()
+    
+    start = time.perf_counter()
+    with PeakMemorySampler() as sampler:
+        if engine == 'csv':
+            df = pd.read_csv(uploaded_file, usecols=column_filter)
+        elif engine == 'parquet':
+            df = _read_parquet(uploaded_file, usecols)
+        elif engine == 'openpyxl' and not name.endswith('.xls'):
+            df = _read_excel_openpyxl(uploaded_file, usecols)
+        else:
+            # calamine 也支持旧版 .xls；没有calamine时 .xls 交给pandas默认引擎
+            df = pd.read_excel(uploaded_file, engine=engine if engine != 'openpyxl' else None, usecols=column_filter)
+    
+    stats = {
+        'engine': engine,
+        'seconds': time.perf_counter() - start,
+        'peak_mb': sampler.peak_bytes / (1024 * 1024) if sampler.peak_bytes is not None else None,
+        'rows': len(df),
+        'columns': len(df.columns),
+    }
+    return df, stats
+
+def format_read_stats(stats):
+    """把读取统计格式化为一行说明文字"""
+    parts = [f"读取引擎: {stats['engine']}", f"耗时 {stats['seconds']:.2f} 秒"]
+    if stats.get('peak_mb') is not None:
+        parts.append(f"内存峰值 +{stats['peak_mb']:.0f} MB")
+    parts.append(f"{stats['rows']:,} 行 × {stats['columns']} 列")
+    return " · ".join(parts)
+
+# 数据集注册表相关配置
+DATASET_REGISTRY_MAX_BYTES = 1024 * 1024 * 1024  # 注册表中数据集的总内存上限（字节）
+DATASET_INFO_MAX_ENTRIES = 1000  # 最多保留多少个数据集的来源信息（数据被淘汰后仍用于显示来源）
+DATASET_KIND_LABELS = {'upload': '上传', 'processed': '预处理', 'filtered': '筛选', 'translated': '翻译'}
+
+def fingerprint(*parts):
+    """由若干部分（文件内容摘要、参数等）生成短的内容指纹"""
+    text = '\x1f'.join(json.dumps(part, sort_keys=True, default=str, ensure_ascii=False) for part in parts)
+    return hashlib.md5(text.encode('utf-8')).hexdigest()[:16]
+
+def fingerprint_file(uploaded_file):
+    """上传文件内容的MD5摘要"""
+    if hasattr(uploaded_file, 'getvalue'):
+        return hashlib.md5(uploaded_file.getvalue()).hexdigest()
+    uploaded_file.seek(0)
+    digest = hashlib.md5(uploaded_file.read()).hexdigest()
+    uploaded_file.seek(0)
+    return digest
+
+class DatasetRegistry:
+    """进程内共享的数据集注册表（线程安全），按内容指纹保存上传、预处理、筛选和翻译后的数据集
+    
+    每个数据集记录类型、来源数据集（parent）和生成参数，形成来源链；DataFrame按总内存上限做LRU淘汰，
+    来源信息单独保留（DataFrame还在时来源信息一定保留）。不同会话上传相同的文件时共用同一个数据集，不重复解析
+    """
+    
+    def __init__(self, max_bytes=DATASET_REGISTRY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._frames = OrderedDict()  # 数据集ID -> (DataFrame, 字节数)，按最近使用排序
+        self._info = OrderedDict()  # 数据集ID -> 来源信息
+    
+    def register(self, dataset_id, df, kind, name, parent=None, params=None):
+        """登记数据集，已存在时只更新最近使用时间；返回数据集ID"""
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if dataset_id in self._frames:
+                self._frames.move_to_end(dataset_id)
+                self._info.move_to_end(dataset_id)
+                return dataset_id
+            
+            self._frames[dataset_id] = (df, size)
+            self.total_bytes += size
+            self._info[dataset_id] = {
+                'id': dataset_id,
+                'kind': kind,
+                'name': name,
+                'parent': parent,
+                'params': params or {},
+                'rows': len(df),
+                'columns': list(df.columns),
+                'bytes': size,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._info.move_to_end(dataset_id)
+            
+            # 至少保留刚登记的数据集
+            while self.total_bytes > self.max_bytes and len(self._frames) > 1:
+                _, (_, evicted_size) = self._frames.popitem(last=False)
+                self.total_bytes -= evicted_size
+            # 只淘汰DataFrame已被淘汰的来源信息，页面按来源信息列出仍可使用的数据集
+            if len(self._info) > DATASET_INFO_MAX_ENTRIES:
+                stale = [info_id for info_id in self._info if info_id not in self._frames]
+                for info_id in stale[:len(self._info) - DATASET_INFO_MAX_ENTRIES]:
+                    del self._info[info_id]
+        return dataset_id
+    
+    def get(self, dataset_id):
+        """返回数据集的浅拷贝（页面新增列不影响共享的数据），不存在或已被淘汰时返回None"""
+        with self._lock:
+            entry = self._frames.get(dataset_id)
+            if entry is None:
+                return None
+            self._frames.move_to_end(dataset_id)
+        return entry[0].copy(deep=False)
+    
+    def contains(self, dataset_id):
+        with self._lock:
+            return dataset_id in self._frames
+    
+    def info(self, dataset_id):
+        """数据集的来源信息，未登记时返回None"""
+        with self._lock:
+            info = self._info.get(dataset_id)
+            return dict(info) if info else None
+    
+    def lineage(self, dataset_id):
+        """从最初的上传数据到该数据集的来源链 [来源信息, ...]"""
+        chain = []
+        while dataset_id and len(chain) < DATASET_INFO_MAX_ENTRIES:
+            info = self.info(dataset_id)
+            if info is None:
+                break
+            chain.append(info)
+            dataset_id = info['parent']
+        return chain[::-1]
+
+_dataset_registry = None
+_dataset_registry_lock = threading.Lock()
+
+def get_dataset_registry():
+    """获取进程内共享的数据集注册表（所有会话共用）"""
+    global _dataset_registry
+    with _dataset_registry_lock:
+        if _dataset_registry is None:
+            _dataset_registry = DatasetRegistry()
+        return _dataset_registry
+
+def remember_dataset(dataset_id):
+    """把数据集记为当前会话正在使用的数据集，各分析页面默认打开它"""
+    dataset_ids = st.session_state.setdefault('dataset_ids', [])
+    if dataset_id in dataset_ids:
+        dataset_ids.remove(dataset_id)
+    dataset_ids.append(dataset_id)
+    st.session_state.dataset_id = dataset_id
+
+def derived_dataset_id(parent, kind, params=None):
+    """由来源数据集ID和生成参数得到派生数据集的ID，不必对整张表计算哈希"""
+    return f"{kind}-{fingerprint(parent, kind, params)}"
+
+def register_dataset(df, kind, name, parent=None, params=None):
+    """登记由其他数据集生成的数据集（预处理、筛选、翻译），并记入当前会话，返回数据集ID"""
+    if parent:
+        dataset_id = derived_dataset_id(parent, kind, params)
+    else:
+        content_hash = hashlib.md5(pd.util.hash_pandas_object(df).values.tobytes()).hexdigest()
+        dataset_id = f"{kind}-{fingerprint(content_hash, list(df.columns), params)}"
+    get_dataset_registry().register(dataset_id, df, kind, name, parent, params)
+    remember_dataset(dataset_id)
+    return dataset_id
+
+def derive_dataset(parent, kind, params, build, name):
+    """按来源数据集ID和生成参数缓存派生数据集：已生成过（任何会话）时直接取出，否则调用 build() 生成并登记
+    
+    返回 (数据集ID, DataFrame)；build 返回None时不登记，返回 (None, None)。没有来源ID时不缓存
+    """
+    registry = get_dataset_registry()
+    if parent:
+        dataset_id = derived_dataset_id(parent, kind, params)
+        df = registry.get(dataset_id)
+        if df is not None:
+            remember_dataset(dataset_id)
+            return dataset_id, df
+    
+    df = build()
+    if df is None:
+        return None, None
+    dataset_id = register_dataset(df, kind, name, parent, params)
+    # 返回副本，调用方新增列不会改动登记的数据；超过容量未能登记时退回浅拷贝
+    registered = registry.get(dataset_id)
+    return dataset_id, registered if registered is not None else df.copy(deep=False)
+
+def load_uploaded_dataset(uploaded_file, usecols=None, remember=True):
+    """读取上传的文件并登记为数据集，返回 (数据集ID, DataFrame, 读取统计)
+    
+    内容和读取列相同的文件（任何会话上传）只解析一次，之后直接从注册表取出，此时读取统计为None。
+    remember 为False时不记入当前会话的数据集列表（如品牌对照表）
+    """
+    registry = get_dataset_registry()
+    dataset_id = f"upload-{fingerprint(fingerprint_file(uploaded_file), sorted(usecols) if usecols else None)}"
+    
+    df = registry.get(dataset_id)
+    stats = None
+    if df is None:
+        df, stats = read_data_file(uploaded_file, usecols)
+        registry.register(dataset_id, df, 'upload', uploaded_file.name)
+        df = df.copy(deep=False)
+    if remember:
+        remember_dataset(dataset_id)
+    return dataset_id, df, stats
+
+def describe_dataset(dataset_id):
+    """数据集的一行说明：来源链、行数"""
+    registry = get_dataset_registry()
+    chain = registry.lineage(dataset_id)
+    if not chain:
+        return dataset_id
+    steps = " → ".join(f"{DATASET_KIND_LABELS.get(info['kind'], info['kind'])}" for info in chain)
+    return f"{chain[0]['name']} · {steps} · {chain[-1]['rows']:,} 行"
+
+def select_session_dataset(required_columns, key):
+    """列出当前会话中包含所需列的数据集供页面选择（默认当前数据集），返回选中的数据集ID
+    
+    没有可用的数据集或选择上传新文件时返回None
+    """
+    registry = get_dataset_registry()
+    dataset_ids = [
+        dataset_id for dataset_id in reversed(st.session_state.get('dataset_ids', []))
+        if registry.contains(dataset_id) and set(required_columns) <= set(registry.info(dataset_id)['columns'])
+    ]
+    if not dataset_ids:
+        return None
+    
+    options = dataset_ids + [None]
+    current = st.session_state.get('dataset_id')
+    return st.selectbox(
+        "📂 选择已加载的数据集",
+        options,
+        index=options.index(current) if current in options else 0,
+        format_func=lambda dataset_id: describe_dataset(dataset_id) if dataset_id else "上传新文件",
+        key=key,
+        help="首页处理、翻译或其他页面上传过的数据无需重新上传"
+    )
+
+def open_page_dataset(dataset_id, uploaded_file, usecols=None):
+    """打开页面选中的数据集或读取上传的文件，返回 (DataFrame, 说明文字)"""
+    if dataset_id is not None:
+        df = get_dataset_registry().get(dataset_id)
+        if df is None:
+            raise ValueError("该数据集已被清理，请重新上传文件")
+        st.session_state.dataset_id = dataset_id
+        return df, f"使用已加载的数据集（未重新解析）：{describe_dataset(dataset_id)}"
+    
+    dataset_id, df, stats = load_uploaded_dataset(uploaded_file, usecols)
+    if stats is None:
+        return df, f"相同的文件已解析过，直接使用：{describe_dataset(dataset_id)}"
+    return df, format_read_stats(stats)
+
+def prepare_review_data(df, brand_df=None, compact=False):
+    """数据预处理（不调用Streamlit组件，可缓存结果），缺少必要的列时抛出 ValueError
+    
+    compact=True 时转为紧凑的数据类型（见 compact_review_dtypes）
+    """
     # 确保所需列存在
-    required_columns = ['Asin', 'Title', 'Content', 'Model', 'Rating', 'Date']
+    required_columns = RAW_DATA_COLUMNS
     if not all(col in df.columns for col in required_columns):
-        st.error(f"缺少必要的列: {[col for col in required_columns if col not in df.columns]}")
-        return None
+        raise ValueError(f"缺少必要的列: {[col for col in required_columns if col not in df.columns]}")
     
     # 只保留必要的列
     df = df[required_columns].copy()
@@ -139,10 +1347,10 @@ def process_data(df, brand_df=None):
     df['Rating'] = pd.to_numeric(df['Rating'], errors='coerce')
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
     
-    # 使用str.strip()的向量化操作
+    # 使用str.strip()的向量化操作，空单元格保持为空值（不变成字符串'nan'）
     text_columns = ['Title', 'Content', 'Model']
     for col in text_columns:
-        df[col] = df[col].astype(str).str.strip()
+        df[col] = _strip_text(df[col])
     
     # 添加ID列（确保唯一性）
     df.insert(0, 'ID', range(1, len(df) + 1))
@@ -159,7 +1367,7 @@ def process_data(df, brand_df=None):
         # 清理品牌数据
         brand_df = brand_df[['Asin', 'Brand']].copy()
         brand_df['Asin'] = brand_df['Asin'].astype(str).str.strip()
-        brand_df['Brand'] = brand_df['Brand'].astype(str).str.strip()
+        brand_df['Brand'] = _strip_text(brand_df['Brand'])
         
         # 处理重复的ASIN，保留最新的品牌信息
         brand_df = brand_df.drop_duplicates(subset=['Asin'], keep='last')
@@ -172,16 +1380,97 @@ def process_data(df, brand_df=None):
         
         # 恢复原始ID
         df['ID'] = original_ids
-        
-        st.success(f"✅ 成功关联品牌数据！共关联 {df['Brand'].notna().sum()} 条记录")
     
     # 重新排序列
-    column_order = ['ID', 'Asin', 'Brand', 'Title', 'Content', 'Model', 'Rating', 'Date', 'Review Type']
+    column_order = PROCESSED_DATA_COLUMNS
     existing_columns = [col for col in column_order if col in df.columns]
     df = df[existing_columns]
     
+    return compact_review_dtypes(df) if compact else df
+
+def associate_brand_data(df, brand_df, compact=False):
+    """把品牌对照表（ASIN、Brand列）关联到已处理的数据，已有Brand列时以对照表为准，返回新的DataFrame"""
+    # 清理品牌数据
+    brand_df = brand_df[['ASIN', 'Brand']].copy()
+    brand_df['ASIN'] = brand_df['ASIN'].astype(str).str.strip()
+    brand_df['Brand'] = _strip_text(brand_df['Brand'])
+    
+    # 处理重复的ASIN，保留最新的品牌信息；重命名ASIN列为Asin以匹配主数据
+    brand_df = brand_df.drop_duplicates(subset=['ASIN'], keep='last').rename(columns={'ASIN': 'Asin'})
+    
+    # 确保有Brand列，如果没有则添加
+    df = df.copy(deep=False)
+    if 'Brand' not in df.columns:
+        df['Brand'] = None
+    
+    # 关联品牌信息前先备份原始ID
+    original_ids = df['ID'].copy()
+    df = df.merge(brand_df, on='Asin', how='left', suffixes=('', '_new'))
+    
+    # 如果存在重复的Brand列，保留新的Brand列
+    if 'Brand_new' in df.columns:
+        df['Brand'] = df['Brand_new']
+        df = df.drop(columns=['Brand_new'])
+    
+    # 恢复原始ID
+    df['ID'] = original_ids
+    
+    # 重新排序列，Brand放在Asin之后
+    columns = df.columns.tolist()
+    columns.remove('Brand')
+    columns.insert(columns.index('Asin') + 1, 'Brand')
+    df = df[columns]
+    return compact_review_dtypes(df) if compact else df
+
+# 紧凑数据类型相关配置
+COMPACT_CATEGORY_COLUMNS = ['Asin', 'Brand', 'Model', 'Review Type']  # 取值重复多的列，转为分类类型
+COMPACT_TEXT_COLUMNS = ['Title', 'Content']  # 长文本列，转为Arrow字符串
+COMPACT_CATEGORY_MAX_RATIO = 0.5  # 不同取值数超过行数的这个比例时分类类型不再省内存，保留为字符串
+
+def get_string_dtype():
+    """紧凑模式下文本列的类型：安装了 pyarrow 时用Arrow字符串（连续内存，没有每个Python对象的开销），否则用pandas字符串类型"""
+    try:
+        import pyarrow  # noqa: F401
+        return 'string[pyarrow]'
+    except ImportError:
+        return 'string'
+
+def _strip_text(series):
+    """把一列转为去掉首尾空白的字符串，空值保持为空值"""
+    return series.where(series.isna(), series.astype(str).str.strip())
+
+def compact_review_dtypes(df):
+    """把处理后的评论数据转为紧凑的数据类型，返回新的DataFrame
+    
+    Asin、Brand、Model、Review Type 转为分类类型，Title、Content 转为Arrow字符串，
+    Rating 为整数评分时转为 Int8，ID 转为最小的整数类型。同一份数据通常只有原来的一小部分内存
+    """
+    df = df.copy(deep=False)
+    string_dtype = get_string_dtype()
+    for col in COMPACT_CATEGORY_COLUMNS:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        values = _strip_text(df[col])
+        if values.nunique() <= max(len(df) * COMPACT_CATEGORY_MAX_RATIO, 1):
+            df[col] = values.astype('category')
+        else:
+            df[col] = values.astype(string_dtype)
+    for col in COMPACT_TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(string_dtype)
+    if 'Rating' in df.columns and pd.api.types.is_numeric_dtype(df['Rating']):
+        ratings = df['Rating'].dropna()
+        if ratings.empty or ((ratings % 1 == 0).all() and ratings.between(-128, 127).all()):
+            df['Rating'] = df['Rating'].astype('Int8')
+    if 'ID' in df.columns and pd.api.types.is_integer_dtype(df['ID']):
+        df['ID'] = pd.to_numeric(df['ID'], downcast='integer')
     return df
 
+def format_memory_usage(df):
+    """数据在内存中的总大小和平均每行字节数，格式化为一行说明文字"""
+    total = int(df.memory_usage(deep=True).sum())
+    return f"内存占用 {total / 1024 / 1024:.1f} MB · 平均每行 {total / max(len(df), 1):,.0f} 字节"
+
 def calculate_review_stats(df):
     """计算评论类型的统计信息"""
     # 计算各类型数量
@@ -238,14 +1527,15 @@ def analyze_by_group(df, group_by):
     """按指定字段进行分组分析"""
     # 使用更高效的分组操作
     if isinstance(group_by, list):
+        # 紧凑模式下这些列是分类类型，不能直接拼接，先转为字符串
         if 'Brand' in group_by:
-            df['Group'] = df['Brand'] + ' - ' + df['Asin'] + ' - ' + df['Model']
+            df['Group'] = df['Brand'].astype('string') + ' - ' + df['Asin'].astype('string') + ' - ' + df['Model'].astype('string')
         else:
-            df['Group'] = df['Asin'] + ' - ' + df['Model']
+            df['Group'] = df['Asin'].astype('string') + ' - ' + df['Model'].astype('string')
         group_by = 'Group'
     
-    # 一次性计算所有统计信息
-    stats = df.groupby(group_by).agg({
+    # 一次性计算所有统计信息（分类类型的分组只保留实际出现的取值）
+    stats = df.groupby(group_by, observed=True).agg({
         'Rating': ['count', 'mean', 'std'],
         'Review Type': lambda x: x.value_counts().to_dict()
     }).round(2)
@@ -262,7 +1552,8 @@ def create_rating_trend_chart(df, group_by):
     """创建评分趋势图"""
     # 使用更高效的时间处理
     df['Month'] = df['Date'].dt.to_period('M').astype(str)
-    trend_data = df.groupby(['Month', group_by])['Rating'].mean().reset_index()
+    trend_data = df.groupby(['Month', group_by], observed=True)['Rating'].mean().reset_index()
+    trend_data[group_by] = trend_data[group_by].astype(str)  # 图例只显示实际出现的分组
     
     # 创建趋势图
     title = f'{group_by}随时间的平均评分变化'
@@ -366,6 +1657,20 @@ def save_fig_to_html(fig, filename):
     """保存图表为HTML文件"""
     return fig.to_html()
 
+def _prepare_parquet_columns(df):
+    """混合类型的文本列（如Excel中数字和文本混排的ASIN）转为字符串，Parquet每列只能有一种类型"""
+    mixed_columns = [
+        col for col in df.columns[df.dtypes == object]
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty')
+    ]
+    if not mixed_columns:
+        return df
+    
+    df = df.copy()
+    for col in mixed_columns:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
 def get_download_data(df, file_format='excel'):
     """准备下载数据"""
     if file_format == 'excel':
@@ -374,6 +1679,11 @@ def get_download_data(df, file_format='excel'):
             df.to_excel(writer, index=False)
         data = output.getvalue()
         return data
+    elif file_format == 'parquet':
+        # 列式格式，保留 prepare_review_data 生成的数据类型（Date、Review Type等），其他页面读取时无需重新解析
+        output = io.BytesIO()
+        _prepare_parquet_columns(df).to_parquet(output, index=False)
+        return output.getvalue()
     else:  # txt format
         # 将DataFrame转换为格式化的文本
         output = io.StringIO()
@@ -392,35 +1702,359 @@ def get_download_data(df, file_format='excel'):
         
         return output.getvalue().encode('utf-8')
 
+# 翻译API限流配置：每秒请求数、每秒字符数（None表示不限制）
+# 腾讯机器翻译按字符计费和限流，字符配额请按账号套餐调整
+ENGINE_RATE_LIMITS = {
+    'google': {'requests_per_second': 5, 'chars_per_second': None},
+    'tencent': {'requests_per_second': 5, 'chars_per_second': 10000},
+    'mock': {'requests_per_second': None, 'chars_per_second': None},  # 本地模拟引擎默认不限流
+}
+
+class TranslationError(Exception):
+    """翻译请求失败；rate_limited 表示被服务端限流，retry_after 为服务端建议的等待秒数"""
+    
+    def __init__(self, message, rate_limited=False, retry_after=None):
+        super().__init__(message)
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+
+class CircuitOpenError(TranslationError):
+    """熔断器打开期间直接拒绝请求，不再调用翻译API"""
+
+# 重试和熔断相关配置
+MAX_RETRIES = 4  # 每个请求的最大尝试次数
+RETRY_BASE_DELAY = 0.5  # 指数退避的初始等待（秒）
+RETRY_MAX_DELAY = 30  # 单次退避等待的上限（秒）
+CIRCUIT_WINDOW = 20  # 熔断器统计最近多少次请求
+CIRCUIT_MIN_REQUESTS = 10  # 至少统计到多少次请求才可能熔断
+CIRCUIT_FAILURE_RATIO = 0.5  # 最近请求的失败比例达到该值时熔断
+CIRCUIT_COOLDOWN = 60  # 熔断后暂停请求的时间（秒），之后放行请求试探引擎是否恢复
+
+def get_retry_delay(attempt, retry_after=None):
+    """第 attempt 次失败后的等待时间：带随机抖动的指数退避，服务端给出 Retry-After 时以其为准"""
+    if retry_after:
+        return min(RETRY_MAX_DELAY, retry_after) + random.uniform(0, RETRY_BASE_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt + 1)))
+
+class CircuitBreaker:
+    """按最近请求的失败比例熔断的熔断器（线程安全），每个翻译引擎一个
+    
+    熔断后 CIRCUIT_COOLDOWN 秒内拒绝请求；冷却结束后进入半开状态，只放行一个试探请求，
+    其他请求在试探结束前仍被拒绝。试探成功则恢复，失败则重新熔断
+    """
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=CIRCUIT_WINDOW)
+        self._opened_at = None
+        self._probe_started = None  # 半开状态下试探请求的开始时间
+    
+    def _probe_pending(self, now):
+        # 试探请求的结果没有记录（如任务被停止）时，超过一个冷却期后允许新的试探
+        return self._probe_started is not None and now - self._probe_started < CIRCUIT_COOLDOWN
+    
+    @property
+    def is_open(self):
+        """是否拒绝新请求（熔断冷却期内，或半开状态下已有试探请求）"""
+        with self._lock:
+            now = time.monotonic()
+            return self._opened_at is not None and (now - self._opened_at < CIRCUIT_COOLDOWN or self._probe_pending(now))
+    
+    def check(self):
+        """熔断冷却期内，或半开状态下已有试探请求时抛出 CircuitOpenError；半开状态下第一个调用者成为试探请求"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = CIRCUIT_COOLDOWN - (now - self._opened_at)
+            if remaining <= 0 and not self._probe_pending(now):
+                self._probe_started = now
+                return
+        if remaining > 0:
+            raise CircuitOpenError(f"翻译引擎 {self.engine} 错误率过高，暂停请求 {remaining:.0f} 秒")
+        raise CircuitOpenError(f"翻译引擎 {self.engine} 正在试探是否恢复，暂停其他请求")
+    
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                # 冷却后的试探请求成功，恢复正常
+                self._opened_at = None
+                self._probe_started = None
+                self._outcomes.clear()
+            self._outcomes.append(True)
+    
+    def record_failure(self):
+        with self._lock:
+            if self._opened_at is not None:
+                # 冷却后的试探请求仍失败，重新熔断
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= CIRCUIT_MIN_REQUESTS and failures / len(self._outcomes) >= CIRCUIT_FAILURE_RATIO:
+                self._opened_at = time.monotonic()
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(engine):
+    """获取指定翻译引擎（或翻译器 name 对应配额）的共享熔断器"""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(engine)
+        if breaker is None:
+            breaker = _circuit_breakers[engine] = CircuitBreaker(engine)
+        return breaker
+
+def call_with_retry(func, translator, max_retries=MAX_RETRIES):
+    """调用翻译请求，失败时按指数退避重试；被限流时暂停该引擎的所有请求，熔断时立即失败"""
+    breaker = get_circuit_breaker(translator.name)
+    for attempt in range(max_retries):
+        breaker.check()
+        try:
+            result = func()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            if attempt == max_retries - 1:
+                raise
+            delay = get_retry_delay(attempt, getattr(e, 'retry_after', None))
+            if getattr(e, 'rate_limited', False):
+                translator.rate_limiter.pause(delay)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+class RateLimiter:
+    """令牌桶限流器，同时限制每秒请求数和每秒字符数（线程安全）
+    
+    请求桶的容量为一秒的配额，但至少为1个请求，每秒不到1个请求（如每1.5秒一个）时也能发出请求
+    """
+    
+    def __init__(self, requests_per_second=None, chars_per_second=None):
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.requests_per_second = requests_per_second
+        self.chars_per_second = chars_per_second
+        self._request_tokens = self._request_capacity
+        self._char_tokens = float(chars_per_second or 0)
+        self._last_refill = time.monotonic()
+    
+    @property
+    def _request_capacity(self):
+        return max(1.0, float(self.requests_per_second)) if self.requests_per_second else 0.0
+    
+    def configure(self, requests_per_second=None, chars_per_second=None):
+        """更新限流速率；剩余令牌不会因此补满，避免调整速率时突发超出配额"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.requests_per_second = requests_per_second
+            self.chars_per_second = chars_per_second
+            self._request_tokens = min(self._request_tokens, self._request_capacity)
+            self._char_tokens = min(self._char_tokens, float(chars_per_second or 0))
+    
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_second:
+            self._request_tokens = min(self._request_capacity, self._request_tokens + elapsed * self.requests_per_second)
+        if self.chars_per_second:
+            self._char_tokens = min(self.chars_per_second, self._char_tokens + elapsed * self.chars_per_second)
+    
+    def pause(self, seconds):
+        """被服务端限流时暂停发出请求（所有共享该限流器的线程都等待）"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+    
+    def acquire(self, chars=0):
+        """阻塞直到请求令牌和字符令牌都足够，然后扣除"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                
+                wait = max(0.0, self._paused_until - now)
+                if self.requests_per_second and self._request_tokens < 1:
+                    wait = max(wait, (1 - self._request_tokens) / self.requests_per_second)
+                if self.chars_per_second:
+                    # 超过桶容量的长文本只需等桶满即可发出，欠下的字符数由后续请求偿还
+                    needed = min(chars, self.chars_per_second)
+                    if self._char_tokens < needed:
+                        wait = max(wait, (needed - self._char_tokens) / self.chars_per_second)
+                
+                if wait <= 0:
+                    if self.requests_per_second:
+                        self._request_tokens -= 1
+                    if self.chars_per_second:
+                        self._char_tokens -= chars
+                    return
+            
+            time.sleep(wait)
+
+class CombinedRateLimiter:
+    """依次通过多个限流器（如翻译任务自己的限速和引擎共享的配额）；被服务端限流时所有限流器都暂停"""
+    
+    def __init__(self, *limiters):
+        self.limiters = limiters
+    
+    def pause(self, seconds):
+        for limiter in self.limiters:
+            limiter.pause(seconds)
+    
+    def acquire(self, chars=0):
+        for limiter in self.limiters:
+            limiter.acquire(chars)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(engine, name=None):
+    """获取共享限流器（进程内所有会话的翻译器实例共用），默认每个引擎一个
+    
+    name 用于区分同一引擎的不同配额（如多组腾讯云密钥），配额使用 ENGINE_RATE_LIMITS 中的引擎配额
+    """
+    name = name or engine
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(**ENGINE_RATE_LIMITS.get(engine, {}))
+            _rate_limiters[name] = limiter
+        return limiter
+
+def configure_rate_limit(engine, requests_per_second=None, chars_per_second=None, name=None):
+    """调整指定引擎（或 name 对应配额）的共享限流速率，未指定的项使用引擎默认配额
+    
+    共享配额是服务器级别的设置，只应在启动时调用；单个翻译任务的限速见 create_translator
+    """
+    defaults = ENGINE_RATE_LIMITS.get(engine, {})
+    requests_per_second = requests_per_second or defaults.get('requests_per_second')
+    chars_per_second = chars_per_second or defaults.get('chars_per_second')
+    
+    limiter = get_rate_limiter(engine, name)
+    if (limiter.requests_per_second, limiter.chars_per_second) != (requests_per_second, chars_per_second):
+        limiter.configure(requests_per_second, chars_per_second)
+    return limiter
+
+def pack_text_batches(texts, max_chars, max_items=None):
+    """按顺序将文本贪心打包成批次，每批总字符数不超过 max_chars、条数不超过 max_items"""
+    batches = []
+    current = []
+    current_chars = 0
+    
+    for text in texts:
+        too_long = current and current_chars + len(text) > max_chars
+        too_many = max_items and len(current) >= max_items
+        if too_long or too_many:
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(text)
+        current_chars += len(text)
+    
+    if current:
+        batches.append(current)
+    return batches
+
 # 腾讯翻译API相关函数
+TENCENT_BATCH_MAX_CHARS = 5999  # TextTranslateBatch 单次请求的文本总长度需低于6000字符
+TENCENT_POOL_SIZE = 10  # 腾讯翻译API的HTTP连接池大小，应不小于并发请求数
+
+def _enable_connection_pool(client, pool_size):
+    """让腾讯云SDK客户端通过带连接池的长连接Session发送请求"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    # SDK默认每次请求都调用 requests.request，会新建连接并重新握手TLS
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    
+    conn = client.request.conn
+    
+    def pooled_request(method, url, body=None, headers=None):
+        headers.setdefault("Host", conn.request_host)
+        return session.request(method=method,
+                               url=url,
+                               data=body,
+                               headers=headers,
+                               proxies=conn.proxy,
+                               verify=conn.certification,
+                               timeout=conn.timeout,
+                               stream=True)
+    
+    conn.request = pooled_request
+    return session
+
+
 class TencentTranslator:
     """腾讯翻译API封装类"""
     
-    def __init__(self, secret_id, secret_key, region='ap-beijing'):
+    engine = 'tencent'
+    supports_batch = True
+    max_chars = 5999  # TextTranslate 单次请求的文本长度需低于6000字符
+    
+    def __init__(self, secret_id, secret_key, region='ap-beijing', pool_size=TENCENT_POOL_SIZE, name=None):
         self.secret_id = secret_id
         self.secret_key = secret_key
         self.region = region
+        self.pool_size = pool_size
+        self.name = name or self.engine  # 限流器和熔断器的名称，不同密钥的配额互相独立
+        self.rate_limiter = get_rate_limiter(self.engine, self.name)
+        self._client = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """复用的TmtClient实例（首次使用时创建，所有线程共享一个连接池）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from tencentcloud.common import credential
+                    from tencentcloud.common.profile.client_profile import ClientProfile
+                    from tencentcloud.common.profile.http_profile import HttpProfile
+                    from tencentcloud.tmt.v20180321 import tmt_client
+                    
+                    cred = credential.Credential(self.secret_id, self.secret_key)
+                    profile = ClientProfile(httpProfile=HttpProfile(keepAlive=True))
+                    client = tmt_client.TmtClient(cred, self.region, profile)
+                    _enable_connection_pool(client, self.pool_size)
+                    self._client = client
+        return self._client
+    
+    def get_cache_key(self, text, source='en', target='zh'):
+        """生成该翻译器的缓存键"""
+        return get_cache_key(text, self.engine, source, target)
+    
+    def load_cached(self, texts, source='en', target='zh'):
+        """批量查询该翻译器的缓存（兼容旧版缓存键），返回 {文本: 译文}"""
+        return load_cached_translations(texts, self.engine, source, target)
+    
+    @staticmethod
+    def _translation_error(err):
+        """把SDK异常转换为 TranslationError，频率限制类错误码标记为限流"""
+        code = getattr(err, 'code', None) or ''
+        return TranslationError(f"腾讯翻译API调用失败: {err}", rate_limited='LimitExceeded' in code)
         
     def translate(self, text, source='en', target='zh'):
         """翻译文本（带缓存）"""
         # 生成缓存键
-        cache_key = get_cache_key(text, 'tencent', source, target)
+        cache_key = self.get_cache_key(text, source, target)
         
         # 尝试从缓存加载
-        cached_result = load_from_cache(cache_key)
+        cached_result = self.load_cached([text], source, target).get(text)
         if cached_result is not None:
             return cached_result
         
         try:
-            from tencentcloud.common import credential
             from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
-            from tencentcloud.tmt.v20180321 import tmt_client, models
-            
-            # 实例化一个认证对象
-            cred = credential.Credential(self.secret_id, self.secret_key)
+            from tencentcloud.tmt.v20180321 import models
             
-            # 实例化要请求产品的client对象
-            client = tmt_client.TmtClient(cred, self.region)
+            # 复用已建立的client对象
+            client = self.client
             
             # 实例化一个请求对象
             req = models.TextTranslateRequest()
@@ -431,52 +2065,969 @@ class TencentTranslator:
             req.Target = target
             req.ProjectId = 0
             
+            # 等待限流令牌（按请求数和字符数）
+            self.rate_limiter.acquire(len(text))
+            
             # 通过client对象调用想要访问的接口
             resp = client.TextTranslate(req)
             
             # 保存到缓存
-            save_to_cache(cache_key, resp.TargetText)
+            save_to_cache(cache_key, resp.TargetText, engine='tencent')
             
             # 返回翻译结果
             return resp.TargetText
                 
         except TencentCloudSDKException as err:
-            raise Exception(f"腾讯翻译API调用失败: {err}")
+            raise self._translation_error(err)
+        except Exception as e:
+            raise TranslationError(f"腾讯翻译API调用失败: {str(e)}")
+    
+    def translate_batch(self, texts, source='en', target='zh'):
+        """批量翻译文本（带缓存），通过TextTranslateBatch一次请求翻译多条，返回与输入顺序一致的列表"""
+        results = self.load_cached(texts, source, target)
+        
+        # 去掉已命中缓存和重复的文本
+        missing = [text for text in dict.fromkeys(texts) if text not in results]
+        if not missing:
+            return [results[text] for text in texts]
+        
+        try:
+            from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+            from tencentcloud.tmt.v20180321 import models
+            
+            client = self.client
+            
+            # 按接口的总长度限制拆分请求
+            for batch in pack_text_batches(missing, TENCENT_BATCH_MAX_CHARS):
+                req = models.TextTranslateBatchRequest()
+                req.SourceTextList = batch
+                req.Source = source
+                req.Target = target
+                req.ProjectId = 0
+                
+                self.rate_limiter.acquire(sum(len(text) for text in batch))
+                resp = client.TextTranslateBatch(req)
+                
+                if len(resp.TargetTextList) != len(batch):
+                    raise TranslationError(f"批量翻译返回 {len(resp.TargetTextList)} 条结果，预期 {len(batch)} 条")
+                
+                save_many({
+                    self.get_cache_key(text, source, target): translation
+                    for text, translation in zip(batch, resp.TargetTextList)
+                }, engine=self.engine)
+                results.update(zip(batch, resp.TargetTextList))
+        
+        except TencentCloudSDKException as err:
+            raise self._translation_error(err)
+        except TranslationError:
+            raise
         except Exception as e:
-            raise Exception(f"腾讯翻译API调用失败: {str(e)}")
+            raise TranslationError(f"腾讯翻译API调用失败: {str(e)}")
+        
+        return [results[text] for text in texts]
 
-def create_translator(engine='google', secret_id=None, secret_key=None):
-    """创建翻译器实例"""
-    if engine == 'google':
-        return CachedGoogleTranslator(source='en', target='zh-CN')
+def create_translator(engine='google', secret_id=None, secret_key=None, requests_per_second=None, chars_per_second=None, pool_size=TENCENT_POOL_SIZE, mock_options=None, composite_options=None, name=None):
+    """创建翻译器实例
+    
+    requests_per_second、chars_per_second 只限制这个翻译器（本次翻译任务）的速率，
+    同时仍受进程内共享的引擎配额限制（见 get_rate_limiter），不会改变其他会话的限流。
+    engine='mock' 时 mock_options 为 MockTranslator 的参数；engine='composite' 时 composite_options 为
+    {'members': [成员引擎参数, ...], 'long_members': [...], 'long_text_chars': 长文本阈值}，
+    成员引擎参数与本函数的参数相同（见 create_composite_translator）
+    """
+    if engine == 'composite':
+        return create_composite_translator(**(composite_options or {}))
+    
+    if engine == 'mock':
+        translator = MockTranslator(pool_size=pool_size, name=name, **(mock_options or {}))
+    elif engine == 'google':
+        translator = CachedGoogleTranslator(source='en', target='zh-CN', name=name)
     elif engine == 'tencent':
         if not secret_id or not secret_key:
             raise ValueError("腾讯翻译API需要提供SecretId和SecretKey")
-        return TencentTranslator(secret_id, secret_key)
+        translator = TencentTranslator(secret_id, secret_key, pool_size=pool_size, name=name)
     else:
         raise ValueError(f"不支持的翻译引擎: {engine}")
+    
+    if requests_per_second or chars_per_second:
+        translator.rate_limiter = CombinedRateLimiter(
+            RateLimiter(requests_per_second, chars_per_second), translator.rate_limiter
+        )
+    return translator
 
 class CachedGoogleTranslator:
     """带缓存的Google翻译器"""
     
-    def __init__(self, source='en', target='zh-CN'):
-        from deep_translator import GoogleTranslator
-        self.translator = GoogleTranslator(source=source, target=target)
+    engine = 'google'
+    supports_batch = False
+    max_chars = 4999  # deep_translator 要求文本长度低于5000字符
+    
+    def __init__(self, source='en', target='zh-CN', name=None):
+        self.source = source
+        self.target = target
+        self.name = name or self.engine
+        self.rate_limiter = get_rate_limiter(self.engine, self.name)
+        # deep_translator 的实例在请求时会修改自身参数，不能跨线程共享
+        self._local = threading.local()
+    
+    def get_translator(self, source=None, target=None):
+        """当前线程专用的GoogleTranslator实例（每个语言对一个）"""
+        source = source or self.source
+        target = target or self.target
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get((source, target))
+        if translator is None:
+            from deep_translator import GoogleTranslator
+            translator = GoogleTranslator(source=source, target=target)
+            translators[(source, target)] = translator
+        return translator
+    
+    def get_cache_key(self, text, source='en', target='zh-CN'):
+        """生成该翻译器的缓存键"""
+        return get_cache_key(text, self.engine, source, target)
+    
+    def load_cached(self, texts, source='en', target='zh-CN'):
+        """批量查询该翻译器的缓存（兼容旧版缓存键），返回 {文本: 译文}"""
+        return load_cached_translations(texts, self.engine, source, target)
         
     def translate(self, text, source='en', target='zh-CN'):
         """翻译文本（带缓存）"""
         # 生成缓存键
-        cache_key = get_cache_key(text, 'google', source, target)
+        cache_key = self.get_cache_key(text, source, target)
         
         # 尝试从缓存加载
-        cached_result = load_from_cache(cache_key)
+        cached_result = self.load_cached([text], source, target).get(text)
         if cached_result is not None:
             return cached_result
         
-        # 调用Google翻译
-        result = self.translator.translate(text)
+        # 等待限流令牌后调用Google翻译
+        self.rate_limiter.acquire(len(text))
+        try:
+            result = self.get_translator(source, target).translate(text)
+        except Exception as e:
+            # deep_translator 在HTTP 429时抛出 TooManyRequests
+            rate_limited = type(e).__name__ == 'TooManyRequests' or '429' in str(e)
+            raise TranslationError(f"Google翻译调用失败: {str(e)}", rate_limited=rate_limited)
         
         # 保存到缓存
-        save_to_cache(cache_key, result)
+        save_to_cache(cache_key, result, engine='google')
         
-        return result 
+        return result
+
+
+def mock_translate_text(text, source='en', target='zh'):
+    """模拟翻译：确定性地生成译文，便于在测试中校验结果"""
+    return f"[{source}->{target}] {text}"
+
+class MockTranslator:
+    """本地模拟翻译器，用于离线测试和性能基准，不调用任何外部翻译API
+    
+    endpoint 为空时在进程内模拟延迟、错误率和每秒字符吞吐；否则请求本地模拟翻译服务
+    （见 mock_translation_server.py），经过真实的HTTP往返、限流(429)和连接池
+    """
+    
+    engine = 'mock'
+    supports_batch = True
+    max_chars = 5999
+    
+    def __init__(self, endpoint=None, latency=0.0, error_rate=0.0, chars_per_second=None, seed=None, pool_size=TENCENT_POOL_SIZE, timeout=30, name=None):
+        self.endpoint = endpoint.rstrip('/') if endpoint else None
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chars_per_second = chars_per_second
+        self.timeout = timeout
+        self.name = name or self.engine
+        self.rate_limiter = get_rate_limiter(self.engine, self.name)
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._session = None
+        
+        if self.endpoint:
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            self._session = requests.Session()
+            self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    
+    def get_cache_key(self, text, source='en', target='zh'):
+        """生成该翻译器的缓存键"""
+        return get_cache_key(text, self.engine, source, target)
+    
+    def load_cached(self, texts, source='en', target='zh'):
+        """批量查询该翻译器的缓存（兼容旧版缓存键），返回 {文本: 译文}"""
+        return load_cached_translations(texts, self.engine, source, target)
+    
+    def _request(self, texts, source, target):
+        """发送一次（模拟的）翻译请求"""
+        with self._lock:
+            self.request_count += 1
+        self.rate_limiter.acquire(sum(len(text) for text in texts))
+        
+        if self.endpoint:
+            resp = self._session.post(
+                f"{self.endpoint}/translate",
+                json={'texts': texts, 'source': source, 'target': target},
+                timeout=self.timeout
+            )
+            if resp.status_code == 429:
+                retry_after = float(resp.headers.get('Retry-After') or 0) or None
+                raise TranslationError("模拟翻译服务限流 (429)", rate_limited=True, retry_after=retry_after)
+            if resp.status_code != 200:
+                raise TranslationError(f"模拟翻译服务返回错误 ({resp.status_code})")
+            return resp.json()['translations']
+        
+        delay = self.latency
+        if self.chars_per_second:
+            delay += sum(len(text) for text in texts) / self.chars_per_second
+        time.sleep(delay)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise TranslationError("模拟翻译请求失败")
+        return [mock_translate_text(text, source, target) for text in texts]
+    
+    def translate(self, text, source='en', target='zh'):
+        """翻译文本（带缓存）"""
+        cached_result = self.load_cached([text], source, target).get(text)
+        if cached_result is not None:
+            return cached_result
+        
+        result = self._request([text], source, target)[0]
+        save_to_cache(self.get_cache_key(text, source, target), result, engine=self.engine)
+        return result
+    
+    def translate_batch(self, texts, source='en', target='zh'):
+        """批量翻译文本（带缓存），返回与输入顺序一致的列表"""
+        results = self.load_cached(texts, source, target)
+        missing = [text for text in dict.fromkeys(texts) if text not in results]
+        
+        for batch in pack_text_batches(missing, self.max_chars):
+            translations = self._request(batch, source, target)
+            save_many({
+                self.get_cache_key(text, source, target): translation
+                for text, translation in zip(batch, translations)
+            }, engine=self.engine)
+            results.update(zip(batch, translations))
+        
+        return [results[text] for text in texts]
+
+COMPOSITE_LONG_TEXT_CHARS = 500  # 组合翻译器按长度分流时，超过该字符数的文本交给长文本翻译器
+
+class CompositeTranslator:
+    """组合多个翻译器，提高总吞吐：按文本长度分流，同组翻译器之间轮询，
+    某个翻译器被限流、熔断或出错时自动切换到其他翻译器
+    
+    translators 翻译短文本（未指定 long_translators 时翻译所有文本），long_translators 翻译长文本。
+    每个成员使用自己引擎的缓存命名空间，以及按成员 name 区分的限流器和熔断器
+    """
+    
+    engine = 'composite'
+    
+    def __init__(self, translators, long_translators=None, long_text_chars=COMPOSITE_LONG_TEXT_CHARS, name=None):
+        if not translators:
+            raise ValueError("组合翻译器至少需要一个翻译引擎")
+        self.translators = list(translators)
+        self.long_translators = list(long_translators or [])
+        self.long_text_chars = long_text_chars
+        self.name = name or self.engine
+        # 组合翻译器本身不限流；所有成员都失败时，call_with_retry 在这里统一退避
+        self.rate_limiter = RateLimiter()
+        self._turn = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def members(self):
+        """所有成员翻译器（短文本组在前）"""
+        return self.translators + [translator for translator in self.long_translators if translator not in self.translators]
+    
+    @property
+    def max_chars(self):
+        # 分段后的片段可能交给任一成员，按最小的长度上限分段
+        return min(get_max_chars(translator) for translator in self.members)
+    
+    @property
+    def supports_batch(self):
+        # 短文本组有不支持批量接口的引擎（Google）时逐条并发请求，避免批量请求在一个线程里串行执行
+        return all(getattr(translator, 'supports_batch', False) for translator in self.translators)
+    
+    def load_cached(self, texts, source='en', target=None):
+        """依次查询各成员引擎的缓存，返回 {文本: 译文}"""
+        target_options = {'target': target} if target else {}
+        results = {}
+        queried_engines = set()
+        for translator in self.members:
+            if translator.engine in queried_engines:
+                continue
+            queried_engines.add(translator.engine)
+            remaining = [text for text in texts if text not in results]
+            if not remaining:
+                break
+            results.update(translator.load_cached(remaining, source=source, **target_options))
+        return results
+    
+    def _candidates(self, long_text):
+        """本次请求依次尝试的成员：对应分组内轮询的下一个在前，其余成员作为备用"""
+        group = self.long_translators if long_text and self.long_translators else self.translators
+        with self._lock:
+            turn = self._turn
+            self._turn += 1
+        offset = turn % len(group)
+        ordered = group[offset:] + group[:offset]
+        return ordered + [translator for translator in self.members if translator not in ordered]
+    
+    def _dispatch(self, long_text, request):
+        """按分流规则依次尝试成员翻译器，跳过熔断中的成员，失败时切换到下一个"""
+        last_error = None
+        for translator in self._candidates(long_text):
+            breaker = get_circuit_breaker(translator.name)
+            try:
+                breaker.check()
+            except CircuitOpenError:
+                continue
+            try:
+                result = request(translator)
+            except Exception as e:
+                breaker.record_failure()
+                if getattr(e, 'rate_limited', False):
+                    # 被限流的成员暂停一段时间，期间的请求由其他成员承担
+                    translator.rate_limiter.pause(get_retry_delay(0, getattr(e, 'retry_after', None)))
+                last_error = e
+            else:
+                breaker.record_success()
+                return result
+        
+        if last_error is None:
+            raise TranslationError("所有翻译引擎都因错误率过高暂停请求")
+        raise TranslationError(
+            f"所有翻译引擎都翻译失败: {last_error}",
+            rate_limited=getattr(last_error, 'rate_limited', False),
+            retry_after=getattr(last_error, 'retry_after', None)
+        )
+    
+    def translate(self, text, source='en', target=None):
+        """翻译文本（带缓存），按长度选择成员"""
+        target_options = {'target': target} if target else {}
+        return self._dispatch(
+            len(text) > self.long_text_chars,
+            lambda translator: translator.translate(text, source=source, **target_options)
+        )
+    
+    def translate_batch(self, texts, source='en', target=None):
+        """批量翻译文本（带缓存），短文本和长文本分别交给对应分组，返回与输入顺序一致的列表"""
+        target_options = {'target': target} if target else {}
+        
+        def request(group_texts):
+            def send(translator):
+                if getattr(translator, 'supports_batch', False):
+                    return translator.translate_batch(group_texts, source=source, **target_options)
+                return [translator.translate(text, source=source, **target_options) for text in group_texts]
+            return send
+        
+        results = {}
+        for long_text in (False, True):
+            group_texts = [text for text in texts if (len(text) > self.long_text_chars) == long_text]
+            if group_texts:
+                results.update(zip(group_texts, self._dispatch(long_text, request(group_texts))))
+        return [results[text] for text in texts]
+
+def create_composite_translator(members, long_members=None, long_text_chars=COMPOSITE_LONG_TEXT_CHARS):
+    """根据成员引擎参数（create_translator 的参数字典）创建组合翻译器
+    
+    多组腾讯云密钥各自使用独立的限流器和熔断器（按SecretId区分）；同一引擎的其他多个成员按序号区分
+    """
+    settings_list = list(members) + list(long_members or [])
+    engine_totals = Counter(settings['engine'] for settings in settings_list)
+    translators = []
+    for index, settings in enumerate(settings_list):
+        settings = dict(settings)
+        engine = settings['engine']
+        if engine == 'composite':
+            raise ValueError("组合翻译器的成员不能是组合翻译器")
+        if 'name' not in settings and engine_totals[engine] > 1:
+            if engine == 'tencent' and settings.get('secret_id'):
+                settings['name'] = f"tencent-{_secret_id_hash(settings['secret_id'])}"
+            else:
+                settings['name'] = f"{engine}-{index + 1}"
+        translators.append(create_translator(**settings))
+    
+    return CompositeTranslator(translators[:len(members)], translators[len(members):], long_text_chars)
+
+# 翻译执行相关配置
+DEFAULT_MAX_WORKERS = 4  # 并发翻译的默认线程数
+MAX_TEXT_LENGTH = 4000  # 超过该长度的文本（或片段）逐条请求，不参与批量请求
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?。！？…])\s+|\s*\n+\s*')
+MAX_CONCURRENT_JOBS = 2  # 后台同时执行的翻译任务数（多个用户共享）
+
+# 翻译文本规范化相关配置
+TERMS_FILE = "translation_terms.json"
+DEFAULT_TRANSLATION_TERMS = {
+    # 翻译前替换（原文 -> 替换后的原文）
+    "source_replacements": {
+        "5 stars": "5星",
+        "4 stars": "4星",
+        "3 stars": "3星",
+        "2 stars": "2星",
+        "1 star": "1星"
+    },
+    # 翻译后修正（译文 -> 修正后的译文），如把被翻译的专业术语改回原文
+    "translation_corrections": {}
+}
+WHITESPACE_PATTERN = re.compile(r'\s+')
+REPEATED_PUNCTUATION_PATTERN = re.compile(r'([。，！？])\1+')
+
+# 语言检测相关配置：按文字系统和常见虚词做本地检测，不调用任何API
+PASSTHROUGH_LANGUAGES = ('zh', 'none')  # 无需翻译、原样保留的语言（已是中文、无文字内容）
+LANGUAGE_NAMES = {
+    'en': "英语", 'es': "西班牙语", 'fr': "法语", 'de': "德语", 'it': "意大利语", 'pt': "葡萄牙语",
+    'ja': "日语", 'ko': "韩语", 'ru': "俄语", 'ar': "阿拉伯语", 'th': "泰语",
+    'zh': "中文（无需翻译）", 'none': "无文字内容（表情/数字等，无需翻译）"
+}
+SCRIPT_PATTERNS = {
+    'zh': re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'),
+    'kana': re.compile(r'[\u3040-\u30ff]'),
+    'ko': re.compile(r'[\u1100-\u11ff\uac00-\ud7af]'),
+    'ru': re.compile(r'[\u0400-\u04ff]'),
+    'ar': re.compile(r'[\u0600-\u06ff]'),
+    'th': re.compile(r'[\u0e00-\u0e7f]'),
+    'latin': re.compile(r'[A-Za-z\u00c0-\u024f]')
+}
+# 各语言的常见虚词；不收录同时是英语常用词或缩写的词（如 die、per、con、para、non、com），
+# 否则英语评论会被误判为其他语言
+LATIN_STOPWORDS = {
+    'en': "the and is it this was for with not very but you my have are they would of to in on that",
+    'es': "el los las que muy pero por una producto bueno está",
+    'fr': "le les très pour avec une je produit bien mais",
+    'de': "der das und nicht sehr für ein eine ich auch aber zu",
+    'it': "il gli è che molto sono questo prodotto della anche",
+    'pt': "não muito uma que mas produto bom está você"
+}
+LATIN_STOPWORD_MIN_HITS = 2  # 其他语言的虚词至少出现的次数，才不按英语翻译
+LATIN_STOPWORD_RATIO = 2  # 其他语言的虚词次数至少是英语虚词次数的倍数
+LATIN_STOPWORD_PATTERNS = {
+    language: re.compile(r'\b(?:' + '|'.join(words.split()) + r')\b', re.IGNORECASE)
+    for language, words in LATIN_STOPWORDS.items()
+}
+
+def detect_languages(series):
+    """对整列文本做本地语言检测，返回同索引的语言代码Series
+    
+    先按文字系统（汉字、假名、韩文、西里尔字母等）判断，拉丁字母文本再按常见虚词区分语言：
+    其他语言的虚词至少出现 LATIN_STOPWORD_MIN_HITS 次且明显多于英语虚词时才判为该语言，
+    否则视为英语；没有任何文字的文本（表情、数字）为 'none'
+    """
+    series = series.astype(str)
+    script_counts = pd.DataFrame({name: series.str.count(pattern) for name, pattern in SCRIPT_PATTERNS.items()})
+    
+    # 日文混用汉字和假名，有假名时按日语处理
+    script_counts['ja'] = script_counts['kana'].where(script_counts['kana'] == 0, script_counts['kana'] + script_counts['zh'])
+    script_counts = script_counts.drop(columns='kana')
+    
+    languages = script_counts.idxmax(axis=1)
+    languages[script_counts.max(axis=1) == 0] = 'none'
+    
+    latin = languages == 'latin'
+    if latin.any():
+        stopword_counts = pd.DataFrame({
+            language: series[latin].str.count(pattern) for language, pattern in LATIN_STOPWORD_PATTERNS.items()
+        })
+        other_counts = stopword_counts.drop(columns='en')
+        best_counts = other_counts.max(axis=1)
+        confident = (best_counts >= LATIN_STOPWORD_MIN_HITS) & (best_counts >= stopword_counts['en'] * LATIN_STOPWORD_RATIO)
+        languages[latin] = other_counts.idxmax(axis=1).where(confident, 'en')
+    
+    return languages
+
+def summarize_languages(df, columns):
+    """统计指定列非空单元格的语言分布，返回 {语言代码: 行数}（按唯一文本检测）"""
+    values = pd.concat([
+        df[col].dropna().astype(str).str.strip() for col in columns if col in df.columns
+    ]) if columns else pd.Series(dtype=object)
+    values = values[values != '']
+    if values.empty:
+        return {}
+    
+    occurrences = values.value_counts()
+    languages = detect_languages(occurrences.index.to_series())
+    return occurrences.groupby(languages.values).sum().sort_values(ascending=False).to_dict()
+
+def load_translation_terms():
+    """从文件加载术语表，文件不存在时使用默认术语表"""
+    terms = {key: dict(value) for key, value in DEFAULT_TRANSLATION_TERMS.items()}
+    if os.path.exists(TERMS_FILE):
+        with open(TERMS_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            for key in terms:
+                if isinstance(data.get(key), dict):
+                    terms[key] = data[key]
+    return terms
+
+def save_translation_terms(terms):
+    """保存术语表到文件"""
+    with open(TERMS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(terms, f, ensure_ascii=False, indent=2)
+
+def split_sentences(text):
+    """按句末标点（. ! ? 。！？…）后的空白和换行切分句子"""
+    return [sentence for sentence in SENTENCE_BOUNDARY_PATTERN.split(text) if sentence.strip()]
+
+def segment_text(text, max_chars):
+    """把长文本切分为句子，再按顺序贪心打包成不超过 max_chars 的片段
+    
+    单个句子超过上限时在空格处（没有空格时直接按长度）切开
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+    
+    segments = []
+    current = []
+    current_chars = 0
+    for piece in pieces:
+        # 片段内的句子以空格连接，空格也计入长度
+        added = len(piece) + (1 if current else 0)
+        if current and current_chars + added > max_chars:
+            segments.append(' '.join(current))
+            current = []
+            current_chars = 0
+            added = len(piece)
+        current.append(piece)
+        current_chars += added
+    if current:
+        segments.append(' '.join(current))
+    return segments
+
+def get_max_chars(translator):
+    """翻译器单次请求允许的最大文本长度"""
+    return getattr(translator, 'max_chars', MAX_TEXT_LENGTH)
+
+def translate_text(text, translator, max_retries=MAX_RETRIES, source='en'):
+    """翻译单个已预处理的文本，失败时退避重试（可在工作线程中调用，最终失败时抛出异常）
+    
+    超过翻译器长度上限的文本按句子分段后逐段翻译；translate_rows 会预先分段并行翻译，不走这里
+    """
+    if not text or pd.isna(text) or str(text).strip() == '':
+        return ''
+    
+    text = str(text).strip()
+    max_chars = get_max_chars(translator)
+    
+    if len(text) > max_chars:
+        return ''.join(
+            call_with_retry(lambda segment=segment: translator.translate(segment, source=source), translator, max_retries)
+            for segment in segment_text(text, max_chars)
+        )
+    
+    return call_with_retry(lambda: translator.translate(text, source=source), translator, max_retries)
+
+def translate_batch_texts(texts, translator, max_retries=MAX_RETRIES, source='en'):
+    """通过一次批量请求翻译多个已预处理的短文本，失败时退避重试，返回与输入顺序一致的译文列表"""
+    return call_with_retry(lambda: translator.translate_batch(texts, source=source), translator, max_retries)
+
+def compile_term_table(terms, whole_words=False):
+    """把术语表编译为一个组合正则（长词优先），术语表为空时返回None
+    
+    whole_words 为True时只匹配完整的词（如 "1 star" 不匹配 "11 stars"），用于英文原文
+    """
+    terms = {source: target for source, target in (terms or {}).items() if source}
+    if not terms:
+        return None
+    pattern = '|'.join(re.escape(source) for source in sorted(terms, key=len, reverse=True))
+    if whole_words:
+        pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+    return re.compile(pattern), terms
+
+def apply_term_table(series, compiled):
+    """一次性对整列文本应用编译后的术语表"""
+    if compiled is None or series.empty:
+        return series
+    pattern, terms = compiled
+    return series.str.replace(pattern, lambda match: terms[match.group(0)], regex=True)
+
+def preprocess_texts(series, terms=None):
+    """预处理整列待翻译文本：合并多余空白，应用翻译前术语替换"""
+    # 与缓存键相同的规范化（NFC、合并空白），发送给翻译API的文本与缓存键一致
+    series = series.str.normalize('NFC').str.replace(WHITESPACE_PATTERN, ' ', regex=True).str.strip()
+    return apply_term_table(series, compile_term_table(terms, whole_words=True))
+
+def postprocess_translations(series, corrections=None):
+    """后处理整列译文：应用译文修正表，合并重复的中文标点"""
+    series = apply_term_table(series, compile_term_table(corrections))
+    return series.str.replace(REPEATED_PUNCTUATION_PATTERN, r'\1', regex=True)
+
+def translate_rows(df, translation_mapping, translator, max_workers=DEFAULT_MAX_WORKERS, batch_size=1, on_progress=None, terms=None):
+    """翻译一段数据的指定列（去重、语言检测、批量查询缓存、线程池并发请求）
+    
+    terms 为术语表（见 load_translation_terms），为None时只做空白和标点规范化。
+    返回 (中文列结果, 统计, 语言分布, 错误信息列表, 失败单元格)，统计为 {'translated', 'errors', 'cached', 'skipped'}
+    的行数，语言分布为 {语言代码: 行数}；翻译失败的单元格在结果中为空值，并以 DataFrame(row=行索引, column=中文列)
+    列出，供重试队列使用。错误信息按错误原因汇总，不逐行输出；不调用Streamlit组件
+    """
+    terms = terms or {}
+    result = pd.DataFrame('', index=df.index, columns=list(translation_mapping.values()))
+    counts = {'translated': 0, 'errors': 0, 'cached': 0, 'skipped': 0}
+    error_reasons = Counter()
+    
+    # 每个中文列的原文（空值不翻译）
+    raw_columns = {}
+    for original_col, chinese_col in translation_mapping.items():
+        values = df[original_col].dropna().astype(str).str.strip()
+        raw_columns[chinese_col] = values[values != '']
+    
+    # 预处理（规范化、术语替换）对每个不同的原文只做一次，再映射回各行
+    raw_texts = pd.unique(pd.concat(raw_columns.values())) if raw_columns else []
+    prepared_texts = dict(zip(raw_texts, preprocess_texts(pd.Series(raw_texts, dtype=object), terms.get('source_replacements'))))
+    prepared_columns = {chinese_col: values.map(prepared_texts) for chinese_col, values in raw_columns.items()}
+    
+    # 去重：所有选中列合并为唯一文本，每个唯一文本只查询缓存和翻译一次，结果再广播回各行
+    occurrences = Counter()
+    for prepared in prepared_columns.values():
+        occurrences.update(prepared.values)
+    unique_texts = list(occurrences)
+    
+    # 语言检测：已是中文或没有文字的文本原样保留，其他文本按检测到的源语言分组翻译
+    text_languages = dict(zip(unique_texts, detect_languages(pd.Series(unique_texts, dtype=object))))
+    language_counts = Counter()
+    passthrough = {}
+    texts_by_language = defaultdict(list)
+    for text, language in text_languages.items():
+        language_counts[language] += occurrences[text]
+        if language in PASSTHROUGH_LANGUAGES:
+            passthrough[text] = text
+            counts['skipped'] += occurrences[text]
+        else:
+            texts_by_language[language].append(text)
+    
+    # 每种源语言一次性批量查询缓存，提前确定哪些文本仍需调用翻译API
+    translations = {}
+    failed_texts = set()
+    pending_by_language = {}
+    for language, texts in texts_by_language.items():
+        cached_translations = translator.load_cached(texts, source=language)
+        translations.update(cached_translations)
+        counts['cached'] += sum(occurrences[text] for text in cached_translations)
+        pending_by_language[language] = [text for text in texts if text not in cached_translations]
+    
+    # 超过翻译器长度上限的文本按句子分段，每个片段作为独立的翻译单元并行翻译、单独缓存，
+    # 长评论局部修改后未变化的片段仍能命中缓存
+    max_chars = get_max_chars(translator)
+    text_segments = {}
+    unit_translations = {}
+    pending_units_by_language = {}
+    unit_occurrences = Counter()
+    for language, pending_texts in pending_by_language.items():
+        units = []
+        for text in pending_texts:
+            segments = segment_text(text, max_chars) if len(text) > max_chars else [text]
+            text_segments[text] = segments
+            units.extend(segments)
+            for segment in segments:
+                unit_occurrences[segment] += occurrences[text]
+        units = list(dict.fromkeys(units))
+        
+        # 整条文本的缓存已经查过，只需再查片段
+        segments_to_check = [unit for unit in units if unit not in text_segments]
+        if segments_to_check:
+            unit_translations.update(translator.load_cached(segments_to_check, source=language))
+        pending_units_by_language[language] = [unit for unit in units if unit not in unit_translations]
+    
+    total_texts = sum(len(units) for units in pending_units_by_language.values())
+    
+    # 支持批量接口的引擎（腾讯）把同一源语言的短文本按批次大小打包，一次请求翻译多条；
+    # 较长的文本和片段逐条请求
+    batch_tasks = []
+    single_tasks = []
+    for language, pending_units in pending_units_by_language.items():
+        if batch_size > 1 and getattr(translator, 'supports_batch', False):
+            short_units = [unit for unit in pending_units if len(unit) <= MAX_TEXT_LENGTH]
+            long_units = [unit for unit in pending_units if len(unit) > MAX_TEXT_LENGTH]
+            batch_tasks.extend(
+                (short_units[i:i + batch_size], language) for i in range(0, len(short_units), batch_size)
+            )
+            single_tasks.extend(([unit], language) for unit in long_units)
+        else:
+            single_tasks.extend(([unit], language) for unit in pending_units)
+    
+    # 网络延迟是瓶颈，用线程池保持多个请求同时进行
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    done = 0
+    try:
+        futures = {}
+        for task_texts, language in batch_tasks:
+            future = executor.submit(translate_batch_texts, task_texts, translator, source=language)
+            futures[future] = (task_texts, True)
+        for task_texts, language in single_tasks:
+            future = executor.submit(translate_text, task_texts[0], translator, source=language)
+            futures[future] = (task_texts, False)
+        
+        for future in as_completed(futures):
+            task_texts, is_batch = futures[future]
+            task_cells = sum(unit_occurrences[text] for text in task_texts)
+            try:
+                results = future.result() if is_batch else [future.result()]
+                unit_translations.update(zip(task_texts, results))
+            except Exception as e:
+                error_reasons[str(e)] += task_cells
+            
+            done += len(task_texts)
+            if on_progress:
+                on_progress(done, total_texts, counts['cached'])
+    finally:
+        # 页面重跑或出错时取消尚未开始的请求，不等待整个队列
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    # 拼接各文本的片段译文；任一片段失败时整条文本记为失败
+    for text, segments in text_segments.items():
+        if all(segment in unit_translations for segment in segments):
+            translations[text] = ''.join(unit_translations[segment] for segment in segments)
+            counts['translated'] += occurrences[text]
+        else:
+            failed_texts.add(text)
+            counts['errors'] += occurrences[text]
+    
+    # 每个唯一译文只做一次后处理（不在重试循环中重复执行）
+    if translations:
+        translations = dict(zip(translations, postprocess_translations(
+            pd.Series(list(translations.values()), dtype=object), terms.get('translation_corrections')
+        )))
+    translations.update(passthrough)
+    
+    # 按行索引广播翻译结果，输出顺序与原数据一致；失败的单元格留空并记录下来
+    failed_cells = []
+    for chinese_col, prepared in prepared_columns.items():
+        result.loc[prepared.index, chinese_col] = prepared.map(translations)
+        failed_rows = prepared.index[prepared.isin(failed_texts)]
+        if len(failed_rows):
+            failed_cells.append(pd.DataFrame({'row': failed_rows, 'column': chinese_col}))
+    failed = pd.concat(failed_cells, ignore_index=True) if failed_cells else pd.DataFrame(columns=['row', 'column'])
+    
+    # 计数为受影响的单元格数（同一行的多个列分别计数），不是行数
+    errors = [f"{cells} 个单元格翻译失败: {reason}" for reason, cells in error_reasons.most_common()]
+    return result, counts, dict(language_counts), errors, failed
+
+def translate_dataframe(df, columns_to_translate, engine='google', secret_id=None, secret_key=None, max_workers=DEFAULT_MAX_WORKERS, requests_per_second=None, chars_per_second=None, batch_size=1, pool_size=TENCENT_POOL_SIZE, on_progress=None, terms=None, mock_options=None, composite_options=None):
+    """同步翻译DataFrame中的指定列（不保存检查点），返回 (翻译结果, 统计, 语言分布, 错误信息列表)"""
+    translator = create_translator(engine, secret_id, secret_key, requests_per_second, chars_per_second, pool_size, mock_options, composite_options)
+    translation_mapping = {col: f"{col}_中文" for col in columns_to_translate if col in df.columns}
+    
+    result, counts, language_counts, errors, _ = translate_rows(
+        df, translation_mapping, translator, max_workers, batch_size, on_progress, terms
+    )
+    return pd.concat([df, result], axis=1), counts, language_counts, errors
+
+def run_translation_job(job_id, engine_settings, on_progress=None, should_stop=None):
+    """执行（或从检查点继续）翻译任务，逐段保存检查点；可在任意线程中调用"""
+    engine_settings = dict(engine_settings)
+    max_workers = engine_settings.pop('max_workers', DEFAULT_MAX_WORKERS)
+    batch_size = engine_settings.pop('batch_size', 1)
+    terms = engine_settings.pop('terms', None)
+    translator = create_translator(**engine_settings)
+    
+    job = update_translation_job(job_id, status='running')
+    df = load_job_input(job_id)
+    translation_mapping = {col: f"{col}_中文" for col in job['columns'] if col in df.columns}
+    pending_chunks = get_pending_job_chunks(job)
+    completed_rows = job['total_rows'] - sum(end - start for start, end in pending_chunks)
+    
+    try:
+        for start, end in pending_chunks:
+            if should_stop and should_stop():
+                update_translation_job(job_id, status='interrupted')
+                return job
+            
+            chunk = df.iloc[start:end]
+            
+            def on_chunk_progress(done, total, cached):
+                if on_progress:
+                    on_progress(completed_rows + (end - start) * done / max(total, 1), job['total_rows'],
+                                f"正在翻译第 {start + 1}-{end} 行，本段 {done}/{total} 条唯一文本")
+            
+            result, counts, language_counts, messages, failed = translate_rows(
+                chunk, translation_mapping, translator, max_workers, batch_size, on_chunk_progress, terms
+            )
+            job = save_job_chunk(job_id, start, end, result, counts, messages, language_counts, failed)
+            completed_rows += end - start
+            if on_progress:
+                on_progress(completed_rows, job['total_rows'], f"已完成 {completed_rows}/{job['total_rows']} 行（检查点已保存）")
+            
+            # 引擎持续出错时暂停任务，冷却后可从检查点继续，避免剩余行段全部失败
+            if get_circuit_breaker(translator.name).is_open:
+                return update_translation_job(job_id, status='interrupted', error=CIRCUIT_OPEN_MESSAGE)
+        
+        # 所有行段完成后，重试队列中失败的单元格再翻译一次
+        for start, failed in load_retry_queue(job_id).items():
+            if should_stop and should_stop():
+                update_translation_job(job_id, status='interrupted')
+                return job
+            if get_circuit_breaker(translator.name).is_open:
+                return update_translation_job(job_id, status='interrupted', error=CIRCUIT_OPEN_MESSAGE)
+            
+            if on_progress:
+                on_progress(job['total_rows'], job['total_rows'], f"正在重试第 {start + 1} 行起的 {len(failed)} 个失败单元格")
+            
+            rows = failed['row'].unique()
+            columns = set(failed['column'])
+            retry_mapping = {col: chinese_col for col, chinese_col in translation_mapping.items() if chinese_col in columns}
+            result, _, _, messages, remaining = translate_rows(
+                df.loc[rows], retry_mapping, translator, max_workers, batch_size, None, terms
+            )
+            job = save_job_retry(job_id, start, failed, result, remaining, messages)
+    except BaseException:
+        # 已保存的检查点保留，稍后可继续
+        update_translation_job(job_id, status='interrupted')
+        raise
+    
+    return update_translation_job(job_id, status='completed', error=None)
+
+def load_translated_dataframe(job_id):
+    """合并任务的原始数据与已完成的翻译结果"""
+    job = load_translation_job(job_id)
+    df = load_job_input(job_id)
+    results = load_job_results(job_id)
+    
+    df_translated = df.copy()
+    for col in job['columns']:
+        chinese_col = f"{col}_中文"
+        if col in df.columns:
+            df_translated[chinese_col] = results[chinese_col] if results is not None else ''
+    return df_translated
+
+class TranslationJobRunner:
+    """后台翻译任务执行器：本地任务队列 + 固定数量的工作线程，与Streamlit脚本运行解耦"""
+    
+    def __init__(self, max_concurrent_jobs=MAX_CONCURRENT_JOBS):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._active = set()
+        self._stop_requested = set()
+        self._progress = {}
+        
+        for i in range(max_concurrent_jobs):
+            worker = threading.Thread(target=self._work, name=f"translation-job-worker-{i}", daemon=True)
+            worker.start()
+    
+    def submit(self, job_id, engine_settings):
+        """提交任务到队列，任务已在队列或执行中时返回False"""
+        with self._lock:
+            if job_id in self._active:
+                return False
+            self._active.add(job_id)
+            self._stop_requested.discard(job_id)
+            self._progress[job_id] = {'message': "排队中..."}
+        
+        update_translation_job(job_id, status='queued', error=None)
+        self._queue.put((job_id, engine_settings))
+        return True
+    
+    def stop(self, job_id):
+        """请求停止任务（当前行段完成并保存检查点后停止）"""
+        with self._lock:
+            if job_id in self._active:
+                self._stop_requested.add(job_id)
+    
+    def is_active(self, job_id):
+        """任务是否在队列中或正在执行"""
+        with self._lock:
+            return job_id in self._active
+    
+    def get_status(self, job_id):
+        """获取任务状态：持久化的任务信息加上内存中的实时进度"""
+        job = load_translation_job(job_id)
+        if job is None:
+            return None
+        
+        with self._lock:
+            progress = dict(self._progress.get(job_id, {}))
+            job['active'] = job_id in self._active
+        
+        done_rows = sum(end - start for start, end in job['completed_chunks'])
+        job['done_rows'] = progress.get('done_rows', done_rows)
+        job['message'] = progress.get('message', '')
+        return job
+    
+    def _work(self):
+        while True:
+            job_id, engine_settings = self._queue.get()
+            
+            def on_progress(done_rows, total_rows, message):
+                with self._lock:
+                    self._progress[job_id] = {'done_rows': done_rows, 'message': message}
+            
+            def should_stop():
+                with self._lock:
+                    return job_id in self._stop_requested
+            
+            try:
+                run_translation_job(job_id, engine_settings, on_progress, should_stop)
+            except Exception as e:
+                update_translation_job(job_id, status='failed', error=str(e))
+            finally:
+                with self._lock:
+                    self._active.discard(job_id)
+                    self._stop_requested.discard(job_id)
+                    self._progress.pop(job_id, None)
+                self._queue.task_done()
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+def get_job_runner():
+    """获取进程内共享的后台翻译任务执行器（所有会话共用）"""
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            _job_runner = TranslationJobRunner()
+        return _job_runner
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="评论分析工具 - 翻译缓存维护")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    migrate_parser = subparsers.add_parser('migrate-cache', help="将旧版 .pkl 缓存导入SQLite缓存库")
+    migrate_parser.add_argument('cache_dir', nargs='?', default=CACHE_DIR, help="旧版缓存目录")
+    migrate_parser.add_argument('--remove', action='store_true', help="导入后删除 .pkl 文件")
+    
+    maintain_parser = subparsers.add_parser('maintain-cache', help="清理过期缓存，超过容量上限时按LRU淘汰并压缩")
+    maintain_parser.add_argument('--max-mb', type=float, default=CACHE_MAX_BYTES / (1024 * 1024), help="缓存容量上限（MB）")
+    
+    export_parser = subparsers.add_parser('export-cache', help="导出缓存包（gzip压缩的JSON Lines）")
+    export_parser.add_argument('output', help="缓存包文件路径，如 cache_bundle.jsonl.gz")
+    export_parser.add_argument('--engine', choices=['google', 'tencent'], help="只导出指定引擎的译文")
+    export_parser.add_argument('--since', help="只导出该日期（YYYY-MM-DD）及之后创建的条目")
+    export_parser.add_argument('--until', help="只导出该日期（YYYY-MM-DD）之前创建的条目")
+    
+    import_parser = subparsers.add_parser('import-cache', help="把缓存包合并到本地缓存")
+    import_parser.add_argument('input', help="缓存包文件路径")
+    import_parser.add_argument('--conflict', choices=CACHE_BUNDLE_CONFLICT_RULES, default='newer',
+                               help="缓存键冲突时的处理规则：newer 保留较新的译文，skip 保留本地，overwrite 使用缓存包")
+    
+    args = parser.parse_args()
+    
+    if args.command == 'migrate-cache':
+        result = migrate_pickle_cache(args.cache_dir, remove_files=args.remove)
+        print(f"导入 {result['imported']} 条，跳过 {result['skipped']} 条")
+    elif args.command == 'maintain-cache':
+        result = run_cache_maintenance(int(args.max_mb * 1024 * 1024))
+        print(f"清理过期 {result['expired']} 条，淘汰 {result['evicted']} 条")
+    elif args.command == 'export-cache':
+        since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+        until = datetime.strptime(args.until, '%Y-%m-%d') if args.until else None
+        with open(args.output, 'wb') as f:
+            count = export_cache_bundle(f, engine=args.engine, created_after=since, created_before=until)
+        print(f"导出 {count} 条到 {args.output}")
+    elif args.command == 'import-cache':
+        with open(args.input, 'rb') as f:
+            result = import_cache_bundle(f, conflict=args.conflict)
+        print(f"导入 {result['imported']} 条，跳过 {result['skipped']} 条（冲突），过期 {result['expired']} 条")